@@ -1,38 +1,33 @@
 # save as make_81_frames.py
 # pip install opencv-python
 
-import cv2
 import argparse
+import os
 from pathlib import Path
 
+from artifact_cache import cached_output
+from batch import tmp_path_for
+import profiling
+from video_index import video_info
+from video_io import WRITER_BACKENDS, FrameReader, open_writer
+
 TARGET_FRAMES = 81
 
 def read_all_frames(video_path):
-    cap = cv2.VideoCapture(str(video_path))
-    if not cap.isOpened():
-        raise RuntimeError(f"Cannot open video: {video_path}")
-
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    if not fps or fps <= 1e-3:
-        fps = 25.0  # sensible default
-
-    frames = []
-    ok, frame = cap.read()
-    while ok:
-        frames.append(frame)
-        ok, frame = cap.read()
+    cap = FrameReader(video_path)
+
+    fps = video_info(video_path)["fps"] or 25.0  # sensible default
+
+    frames = list(cap)
 
     cap.release()
     return frames, fps
 
-def write_video(frames, out_path, fps):
+def write_video(frames, out_path, fps, backend="cv2", meta=None):
     if len(frames) == 0:
         raise RuntimeError("No frames to write.")
     h, w = frames[0].shape[:2]
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")  # widely supported
-    out = cv2.VideoWriter(str(out_path), fourcc, fps, (w, h))
-    if not out.isOpened():
-        raise RuntimeError(f"Cannot open output for writing: {out_path}")
+    out = open_writer(out_path, fps, (w, h), backend=backend, meta=meta)  # mp4v, widely supported
 
     for f in frames:
         out.write(f)
@@ -52,20 +47,107 @@ def ensure_81_frames(frames, truncate=False):
     # else: leave as-is (>=81) when not truncating
     return frames
 
+def stream_81_frames(video_path, out_path, fps, truncate=False, target=TARGET_FRAMES, backend="cv2",
+                     meta=None):
+    """
+    Same result as read_all_frames + ensure_81_frames + write_video, but frames are
+    decoded and written one at a time. Only the last decoded frame is kept (for padding),
+    and decoding stops at `target` when truncating, so memory does not grow with input length.
+    Returns the number of frames written.
+    """
+    cap = FrameReader(video_path)
+
+    out = None
+    last = None
+    n = 0
+    try:
+        ok, frame = cap.read()
+        while ok:
+            if out is None:
+                h, w = frame.shape[:2]
+                out = open_writer(out_path, fps, (w, h), backend=backend, meta=meta)
+            out.write(frame)
+            last = frame
+            n += 1
+            if truncate and n >= target:
+                break
+            ok, frame = cap.read()
+        if last is None:
+            raise RuntimeError("Input video has 0 frames.")
+        # append the last frame until we reach target
+        while n < target:
+            out.write(last)
+            n += 1
+    finally:
+        cap.release()
+        if out is not None:
+            out.release()
+    return n
+
+def pad_81_file(input, output, truncate=False, backend="cv2", cache=None, cache_max=None):
+    """
+    stream_81_frames (16 fps, as the CLI) for one file, written to a temp name and renamed
+    into place; with `cache`, an identical earlier request is copied from the artifact cache.
+    Returns a small dict of stats (job queue / worker record).
+    """
+    stats = {}
+    output = Path(output)
+
+    def produce(out_path):
+        tmp = tmp_path_for(out_path)
+        try:
+            stats["frames"] = stream_81_frames(input, tmp, 16, truncate=truncate, backend=backend,
+                                               meta={"source": str(input)})
+            os.replace(tmp, out_path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+    params = {"target": TARGET_FRAMES, "truncate": truncate, "fps": 16, "backend": backend}
+    if cached_output(cache, input, "ensure_81_frames", params, output, produce, max_bytes=cache_max):
+        stats["cache"] = "hit"
+    return stats
+
 def main():
     parser = argparse.ArgumentParser(description="Pad a video to 81 frames by repeating the last frame.")
     parser.add_argument("input", type=Path, help="Path to input video (e.g., yatch.mp4)")
     parser.add_argument("-o", "--output", type=Path, default=Path("output_81.mp4"),
-                        help="Path to output video (default: output_81.mp4)")
+                        help="Path to output video (default: output_81.mp4); a .npy path writes a "
+                             "memory-mappable frame array instead")
     parser.add_argument("--truncate", action="store_true",
                         help="If set, truncate videos longer than 81 frames to exactly 81.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Decode and write one frame at a time (constant memory for any input length).")
+    parser.add_argument("--writer", choices=WRITER_BACKENDS, default="cv2",
+                        help="Encoder backend: cv2 (mp4v) or ffmpeg (libx264, browser-playable; default: cv2)")
+    parser.add_argument("--cache", type=Path, default=None,
+                        help="Artifact cache directory: reuse the result of an identical earlier request")
+    parser.add_argument("--cache-max", default=None,
+                        help="Cache size limit, LRU-evicted (e.g. 20G; default: $VIDEO_CACHE_MAX or 20G)")
+    profiling.add_argument(parser)
     args = parser.parse_args()
+    profiling.setup(args.profile)
+
+    result = {}
+    meta = {"source": str(args.input)}
+    def produce(out_path):
+        if args.stream:
+            result["n"] = stream_81_frames(args.input, out_path, 16, truncate=args.truncate, backend=args.writer,
+                                           meta=meta)
+        else:
+            frames, fps = read_all_frames(args.input)
+            frames = ensure_81_frames(frames, truncate=args.truncate)
+            write_video(frames, out_path, 16, backend=args.writer, meta=meta)
+            result["n"] = len(frames)
 
-    frames, fps = read_all_frames(args.input)
-    frames = ensure_81_frames(frames, truncate=args.truncate)
-    write_video(frames, args.output, 16)
+    # streaming and in-memory produce the same frames, so they share cache entries
+    params = {"target": TARGET_FRAMES, "truncate": args.truncate, "fps": 16, "backend": args.writer}
+    if cached_output(args.cache, args.input, "ensure_81_frames", params, args.output, produce,
+                     max_bytes=args.cache_max):
+        print(f"Done. Saved to {args.output} (from cache).")
+        return
 
-    print(f"Done. Saved to {args.output} ({len(frames)} frames at 16 fps).")
+    print(f"Done. Saved to {args.output} ({result['n']} frames at 16 fps, peak RSS {profiling.peak_rss_mb():.1f} MB).")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,218 @@
+# artifact_cache.py
+#
+# Content-addressed cache for the outputs of our per-clip operations.
+# Key = sha256(input file content) + operation name + JSON of its parameters, so a repeated
+# request (same bytes in, same op, same params) returns the stored artifact instead of
+# decoding again, whatever the input file is called.
+# - size-bounded: least recently used artifacts are evicted past `max_bytes`
+# - atomic: artifacts are produced into a temp file and os.replace()d into place, so
+#   concurrent workers never see half-written entries
+# - hit / miss / eviction counters are kept in a small SQLite file next to the objects
+#   python artifact_cache.py stats            # show counters and size
+#   python artifact_cache.py evict --max 5G   # shrink now
+#
+# Location: $VIDEO_CACHE_DIR, else ~/.cache/video_process/artifacts
+# Size limit: $VIDEO_CACHE_MAX (e.g. "20G"), else 20G
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+
+DEFAULT_DIR = Path.home() / ".cache" / "video_process" / "artifacts"
+DEFAULT_MAX = "20G"
+_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def parse_bytes(s):
+    """ "500M" / "20G" / "1048576" -> bytes """
+    s = str(s).strip().upper().rstrip("B")
+    unit = s[-1] if s and s[-1] in _UNITS else ""
+    return int(float(s[:len(s) - len(unit)]) * _UNITS[unit])
+
+
+class ArtifactCache:
+    def __init__(self, root=None, max_bytes=None):
+        self.root = Path(root or os.environ.get("VIDEO_CACHE_DIR") or DEFAULT_DIR)
+        self.max_bytes = parse_bytes(max_bytes or os.environ.get("VIDEO_CACHE_MAX") or DEFAULT_MAX)
+        self.objects = self.root / "objects"
+        self.tmp = self.root / "tmp"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.tmp.mkdir(parents=True, exist_ok=True)
+        with self._db() as con:
+            con.execute("CREATE TABLE IF NOT EXISTS hashes ("
+                        "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT)")
+            con.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+
+    @contextlib.contextmanager
+    def _db(self):
+        con = sqlite3.connect(str(self.root / "cache.sqlite"), timeout=60)
+        try:
+            with con:  # commit on success
+                yield con
+        finally:
+            con.close()
+
+    def _bump(self, name, n=1):
+        with self._db() as con:
+            con.execute("INSERT INTO stats VALUES (?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, n))
+
+    def content_hash(self, path):
+        """sha256 of the file's bytes, memoized per (path, size, mtime)."""
+        path = Path(path).resolve()
+        st = path.stat()
+        with self._db() as con:
+            row = con.execute("SELECT size, mtime_ns, sha256 FROM hashes WHERE path = ?",
+                              (str(path),)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._db() as con:
+            con.execute("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)",
+                        (str(path), st.st_size, st.st_mtime_ns, digest))
+        return digest
+
+    def key(self, input_path, op, params):
+        blob = json.dumps({"input": self.content_hash(input_path), "op": op, "params": params},
+                          sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def _object(self, key, suffix):
+        return self.objects / key[:2] / (key + suffix)
+
+    def get(self, key, suffix):
+        """Path of the cached artifact (and mark it recently used), or None."""
+        obj = self._object(key, suffix)
+        try:
+            os.utime(obj)  # mtime doubles as the LRU clock
+        except FileNotFoundError:
+            self._bump("misses")
+            return None
+        self._bump("hits")
+        return obj
+
+    def put(self, key, src, suffix):
+        """Move a finished artifact into the cache atomically; returns its cache path."""
+        obj = self._object(key, suffix)
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(src, obj)
+        self.evict()
+        return obj
+
+    def cached(self, input_path, op, params, out_path, produce):
+        """
+        Write the result of `op` on `input_path` to out_path, from the cache if possible.
+        produce(tmp_path) must create the artifact at tmp_path (same suffix as out_path).
+        Returns True on a cache hit.
+        """
+        out_path = Path(out_path)
+        suffix = out_path.suffix
+        key = self.key(input_path, op, params)
+        obj = self.get(key, suffix)
+        hit = obj is not None
+        if not hit:
+            tmp = self.tmp / f"{key}.{os.getpid()}{suffix}"
+            try:
+                produce(tmp)
+                obj = self.put(key, tmp, suffix)
+            finally:
+                if tmp.exists():
+                    tmp.unlink()
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out_tmp = out_path.with_name(f".{out_path.stem}.{os.getpid()}.tmp{suffix}")
+        try:
+            shutil.copyfile(obj, out_tmp)
+        except FileNotFoundError:
+            # Evicted by another worker between lookup and copy: produce it directly
+            produce(out_tmp)
+        os.replace(out_tmp, out_path)
+        return hit
+
+    def _entries(self):
+        for p in self.objects.glob("*/*"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            yield p, st.st_size, st.st_mtime
+
+    def evict(self, max_bytes=None):
+        """Delete least recently used artifacts until the cache fits in max_bytes."""
+        limit = self.max_bytes if max_bytes is None else parse_bytes(max_bytes)
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(e[1] for e in entries)
+        removed = 0
+        for p, size, _ in entries:
+            if total <= limit:
+                break
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                continue
+            total -= size
+            removed += 1
+        if removed:
+            self._bump("evictions", removed)
+        # Temp files left by crashed workers
+        for p in self.tmp.iterdir():
+            try:
+                if time.time() - p.stat().st_mtime > 24 * 3600:
+                    p.unlink()
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def stats(self):
+        with self._db() as con:
+            counters = dict(con.execute("SELECT name, value FROM stats").fetchall())
+        entries = list(self._entries())
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+            "entries": len(entries),
+            "bytes": sum(e[1] for e in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+def cached_output(cache_dir, input_path, op, params, out_path, produce, max_bytes=None):
+    """
+    Helper for the scripts: run produce(out_path) directly when cache_dir is None,
+    otherwise go through an ArtifactCache in cache_dir. Returns True on a cache hit.
+    """
+    if cache_dir is None:
+        produce(out_path)
+        return False
+    return ArtifactCache(cache_dir, max_bytes).cached(input_path, op, params, out_path, produce)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect or trim the artifact cache.")
+    ap.add_argument("command", choices=("stats", "evict", "clear"))
+    ap.add_argument("--dir", type=Path, default=None, help=f"Cache directory (default: {DEFAULT_DIR})")
+    ap.add_argument("--max", default=None, help="Size limit for evict, e.g. 5G (default: configured limit)")
+    args = ap.parse_args()
+
+    cache = ArtifactCache(args.dir)
+    if args.command == "evict":
+        print(f"Evicted {cache.evict(args.max)} artifacts")
+    elif args.command == "clear":
+        print(f"Evicted {cache.evict(0)} artifacts")
+    print(json.dumps(cache.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
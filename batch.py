@@ -0,0 +1,134 @@
+# batch.py
+#
+# Run one per-clip function over many inputs with a process pool.
+# Every finished job is appended to a JSONL results manifest (status + timings), and
+# jobs whose output is already recorded as "ok" are skipped, so a crashed run can be
+# restarted with the same command and picks up where it stopped.
+
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import profiling
+
+VIDEO_EXTS = (".mp4", ".mov", ".mkv", ".avi", ".webm", ".m4v")
+
+
+def collect_inputs(src, exts=VIDEO_EXTS):
+    """
+    Return (root, [paths]) for a batch source.
+    - directory: every file with a video extension below it (recursive, sorted)
+    - manifest: a text file with one path per line, or JSONL with an "input" key
+    root is the directory outputs are made relative to (None for manifests).
+    """
+    src = Path(src)
+    if src.is_dir():
+        paths = sorted(p for p in src.rglob("*") if p.is_file() and p.suffix.lower() in exts)
+        return src, paths
+    if not src.is_file():
+        raise FileNotFoundError(src)
+    paths = []
+    for line in src.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            line = json.loads(line)["input"]
+        paths.append(Path(line))
+    return None, paths
+
+
+def output_path_for(in_path, root, out_dir, suffix=".mp4"):
+    """Mirror the input layout below out_dir (flat by file name when root is None)."""
+    in_path = Path(in_path)
+    rel = in_path.relative_to(root) if root is not None else Path(in_path.name)
+    return Path(out_dir) / rel.with_suffix(suffix)
+
+
+def load_finished(manifest_path):
+    """Outputs recorded as "ok" in the manifest that still exist on disk."""
+    done = set()
+    manifest_path = Path(manifest_path)
+    if not manifest_path.exists():
+        return done
+    with open(manifest_path) as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from a crash
+            if rec.get("status") == "ok" and Path(rec["output"]).exists():
+                done.add(rec["output"])
+    return done
+
+
+def tmp_path_for(out_path):
+    """Sibling temp name with the same extension (writers pick the container from it)."""
+    out_path = Path(out_path)
+    return out_path.with_name(f".{out_path.stem}.{os.getpid()}.tmp{out_path.suffix}")
+
+
+def _run_job(fn, job, profile=False):
+    if profile:
+        profiling.enable()  # fresh numbers for this job
+    t0 = time.perf_counter()
+    rec = {"input": str(job["input"]), "output": str(job["output"])}
+    try:
+        result = fn(**job)
+        rec["status"] = "ok"
+        if isinstance(result, dict):
+            rec.update(result)
+    except Exception as e:
+        rec["status"] = "error"
+        rec["error"] = f"{type(e).__name__}: {e}"
+        rec["traceback"] = traceback.format_exc(limit=3)
+    rec["seconds"] = round(time.perf_counter() - t0, 4)
+    rec["pid"] = os.getpid()
+    if profile:
+        rec["profile"] = profiling.snapshot()
+    return rec
+
+
+def run_batch(fn, jobs, manifest_path, workers=None, initializer=None, verbose=True, tally=None):
+    """
+    Call fn(**job) for every job dict (must contain "input" and "output") in a process pool.
+    fn must be a module-level function so it can be pickled.
+    When profiling is on (--profile), each record also carries that job's profile snapshot.
+    Returns a dict of counts: {"ok": .., "error": .., "skipped": ..}. With tally="key", the
+    values of that key in successful results are also counted, under counts[key].
+    """
+    manifest_path = Path(manifest_path)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    finished = load_finished(manifest_path)
+    todo = [j for j in jobs if str(j["output"]) not in finished]
+    counts = {"ok": 0, "error": 0, "skipped": len(jobs) - len(todo)}
+    if tally:
+        counts[tally] = {}
+    if verbose:
+        print(f"[batch] {len(jobs)} jobs, {counts['skipped']} already done, {len(todo)} to run")
+    if not todo:
+        return counts
+
+    workers = workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    with open(manifest_path, "a") as mf, \
+            ProcessPoolExecutor(max_workers=workers, initializer=initializer) as pool:
+        futures = [pool.submit(_run_job, fn, j, profiling.enabled()) for j in todo]
+        for i, fut in enumerate(as_completed(futures), 1):
+            rec = fut.result()
+            counts[rec["status"]] += 1
+            if tally and rec["status"] == "ok":
+                counts[tally][rec.get(tally)] = counts[tally].get(rec.get(tally), 0) + 1
+            mf.write(json.dumps(rec) + "\n")
+            mf.flush()
+            os.fsync(mf.fileno())
+            if verbose and (rec["status"] != "ok" or i % 100 == 0 or i == len(todo)):
+                print(f"[batch] {i}/{len(todo)} {rec['status']}: {rec['input']}"
+                      + (f" ({rec['error']})" if rec["status"] != "ok" else ""))
+    if verbose:
+        dt = time.perf_counter() - t0
+        print(f"[batch] done in {dt:.1f}s with {workers} workers: {counts}")
+    return counts
@@ -0,0 +1,86 @@
+# bench_clip_array.py
+# pip install opencv-python
+#
+# Compare loading an 81-frame clip the way the data loader does today (decode the MP4 into
+# a T x H x W x 3 array) with memory-mapping the same clip written as .npy (clip_array.py).
+# Both files are made from the input first; timings are with a warm page cache.
+#   python bench_clip_array.py input.mp4 --size 832x480
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from clip_array import load_clip
+from resize_video_81 import parse_size, resize_81_file
+
+
+def decode_mp4(path):
+    cap = cv2.VideoCapture(str(path))
+    frames = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return np.stack(frames)
+
+
+def decode_mp4_frame(path, i):
+    cap = cv2.VideoCapture(str(path))
+    cap.set(cv2.CAP_PROP_POS_FRAMES, i)
+    ok, frame = cap.read()
+    cap.release()
+    return frame
+
+
+def mmap_npy(path):
+    return np.array(load_clip(path)[0])  # materialise every frame
+
+
+def mmap_npy_frame(path, i):
+    return np.array(load_clip(path)[0][i])
+
+
+def bench(fn, *args, repeat=5):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(*args)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark MP4 decode vs memory-mapped .npy clip loading.")
+    ap.add_argument("input", type=Path, help="Input video path")
+    ap.add_argument("--size", type=parse_size, default=None, help="Clip size WxH (default: input size)")
+    ap.add_argument("--repeat", type=int, default=5, help="Runs per variant; best time is kept")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        mp4, npy = Path(tmp) / "clip.mp4", Path(tmp) / "clip.npy"
+        resize_81_file(args.input, mp4, size=args.size)
+        resize_81_file(args.input, npy, size=args.size)
+        n = len(load_clip(npy)[0])
+        i = random.randrange(n)
+        print(f"clip: {load_clip(npy)[0].shape}  mp4: {mp4.stat().st_size / 1e6:.1f} MB  "
+              f"npy: {npy.stat().st_size / 1e6:.1f} MB")
+        rows = (
+            ("full clip", bench(decode_mp4, mp4, repeat=args.repeat), bench(mmap_npy, npy, repeat=args.repeat)),
+            (f"frame {i}", bench(decode_mp4_frame, mp4, i, repeat=args.repeat),
+             bench(mmap_npy_frame, npy, i, repeat=args.repeat)),
+        )
+    for name, t_mp4, t_npy in rows:
+        print(f"{name:>10}: mp4 decode {t_mp4 * 1000:.1f} ms  npy mmap {t_npy * 1000:.2f} ms  "
+              f"({t_mp4 / t_npy:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
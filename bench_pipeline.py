@@ -0,0 +1,89 @@
+# bench_pipeline.py
+# pip install opencv-python
+#
+# Compare the old single-threaded cap.read() -> resize -> writer.write() loop with the
+# threaded FrameReader / AsyncWriter pipeline from video_io.py.
+#   python bench_pipeline.py input.mp4 --size 640x360
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+
+from resize_video_81 import parse_size
+from video_io import FrameReader, open_writer
+
+
+def serial_loop(in_path, out_path, size):
+    cap = cv2.VideoCapture(str(in_path))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    out = cv2.VideoWriter(str(out_path), cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    n = 0
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if (frame.shape[1], frame.shape[0]) != size:
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        out.write(frame)
+        n += 1
+    cap.release()
+    out.release()
+    return n
+
+
+def pipelined_loop(in_path, out_path, size):
+    cap = FrameReader(in_path)
+    out = open_writer(out_path, cap.fps or 25.0, size)
+    n = 0
+    for frame in cap:
+        if (frame.shape[1], frame.shape[0]) != size:
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        out.write(frame)
+        n += 1
+    cap.release()
+    out.release()
+    return n
+
+
+def bench(fn, in_path, size, repeat):
+    best = None
+    n = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        out_path = Path(tmp) / "out.mp4"
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            n = fn(in_path, out_path, size)
+            dt = time.perf_counter() - t0
+            best = dt if best is None else min(best, dt)
+    return n, best
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark serial vs pipelined decode/resize/encode.")
+    ap.add_argument("input", type=Path, help="Input video path")
+    ap.add_argument("--size", type=parse_size, default=None,
+                    help="Resize to WxH (default: keep input size)")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per variant; best time is kept")
+    args = ap.parse_args()
+
+    size = args.size
+    if size is None:
+        cap = cv2.VideoCapture(str(args.input))
+        size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        cap.release()
+
+    print(f"cores: {os.cpu_count()}  size: {size[0]}x{size[1]}")
+    results = {}
+    for name, fn in (("serial", serial_loop), ("pipelined", pipelined_loop)):
+        n, dt = bench(fn, args.input, size, args.repeat)
+        results[name] = n / dt
+        print(f"{name:>10}: {n} frames in {dt:.3f}s  ({n / dt:.1f} fps)")
+    print(f"speedup: {results['pipelined'] / results['serial']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
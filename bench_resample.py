@@ -0,0 +1,82 @@
+# bench_resample.py
+# pip install opencv-python
+#
+# Compare picking N evenly spaced frames by decoding everything (cap.read() on every frame,
+# keep the selected ones) with read_frames_at() from resize_video_81.py, which grab()s the
+# dropped frames and seeks across keyframes.
+#   python bench_resample.py input.mp4 --n 81
+
+import argparse
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from resize_video_81 import TARGET, read_frames_at, uniform_indices
+from video_index import video_info
+
+
+def full_decode(in_path, indices, keyframes=None):
+    wanted = set(indices)
+    got = {}
+    cap = cv2.VideoCapture(str(in_path))
+    i = 0
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if i in wanted:
+            got[i] = frame.copy()
+        i += 1
+    cap.release()
+    return [got[i] for i in indices if i in got]
+
+
+def grab_only(in_path, indices, keyframes=None):
+    return read_frames_at(in_path, indices)
+
+
+def grab_and_seek(in_path, indices, keyframes=None):
+    return read_frames_at(in_path, indices, keyframes=keyframes)
+
+
+def bench(fn, in_path, indices, keyframes, repeat):
+    best = None
+    frames = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        frames = fn(in_path, indices, keyframes)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return frames, best
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark full decode vs grab()/seek frame resampling.")
+    ap.add_argument("input", type=Path, help="Input video path")
+    ap.add_argument("--n", type=int, default=TARGET, help=f"Frames to pick (default: {TARGET})")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per variant; best time is kept")
+    args = ap.parse_args()
+
+    info = video_info(args.input, need_frames=True)
+    indices = uniform_indices(info["frame_count"], args.n)
+    keyframes = info["keyframes"]
+    print(f"frames: {info['frame_count']}  picked: {len(indices)}  "
+          f"keyframes: {len(keyframes) if keyframes else 'unknown'}")
+    ref = None
+    times = {}
+    for name, fn in (("full", full_decode), ("grab", grab_only), ("grab+seek", grab_and_seek)):
+        frames, dt = bench(fn, args.input, indices, keyframes, args.repeat)
+        times[name] = dt
+        same = "" if ref is None else \
+            ("  same frames" if len(frames) == len(ref) and all(np.array_equal(a, b) for a, b in zip(frames, ref))
+             else "  FRAMES DIFFER")
+        ref = ref if ref is not None else frames
+        print(f"{name:>10}: {dt:.3f}s{same}")
+    for name in ("grab", "grab+seek"):
+        print(f"speedup {name}: {times['full'] / times[name]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# bench_suite.py
+#
+# Reproducible throughput benchmark for every entry point in the repo.
+# Synthetic test videos (ffmpeg testsrc2, several resolutions / lengths / GOP sizes /
+# codecs) are generated once into a data directory; each script is then run on each video
+# as its own process with --profile. Frames/sec (input frames / run time), wall time and
+# peak memory (the script or its ffmpeg child, whichever is larger) are recorded as the
+# median of --repeat runs.
+#   python bench_suite.py --save baseline.json                 # record a baseline
+#   python bench_suite.py --compare baseline.json              # rerun, flag regressions
+#   python bench_suite.py --cases 240p_short_h264 --entries resize,trim --repeat 1
+#
+# --compare exits with status 1 when any entry is slower than the baseline by more than
+# --threshold (default 10%), so it can gate a change in CI.
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+DEFAULT_DATA = Path.home() / ".cache" / "video_process" / "bench"
+HERE = Path(__file__).resolve().parent
+
+# name -> (size, frames, codec, gop)
+CASES = {
+    "240p_short_h264": ("320x240", 60, "libx264", 12),
+    "240p_long_h264": ("320x240", 600, "libx264", 250),
+    "720p_81_h264": ("1280x720", 81, "libx264", 30),
+    "720p_long_mpeg4": ("1280x720", 300, "mpeg4", 30),
+    "1080p_short_h264": ("1920x1080", 120, "libx264", 60),
+}
+
+# name -> argv after the script, with {in} / {out} placeholders
+ENTRIES = {
+    "append": ("append_last_frame.py", ["{in}", "-o", "{out}/append.mp4"]),
+    "concat": ("concat_vid.py", ["{in}", "{in}", "-o", "{out}/concat.mp4", "--no-copy"]),
+    "duplicate": ("duplitcate_frames.py", ["{in}", "-o", "{out}/dup.mp4"]),
+    "freeze": ("make_freeze_vid.py", ["{in}", "-o", "{out}/freeze.mp4"]),
+    "last_frame": ("get_frame.py", ["{in}", "-o", "{out}/last.jpg"]),
+    "resize": ("resize_video_81.py", ["{in}", "-o", "{out}/r81.mp4"]),
+    "trim": ("trim_frame.py", ["{in}", "-o", "{out}/trim.mp4", "--start", "10", "--end", "50"]),
+    "fix": ("viewable.py", ["{in}", "-o", "{out}/fix.mp4", "--force-transcode"]),
+}
+
+
+def make_video(path, size, frames, codec, gop):
+    """Deterministic synthetic clip (moving test pattern, 25 fps, no audio)."""
+    codec_args = ["-c:v", codec, "-g", str(gop), "-pix_fmt", "yuv420p"]
+    codec_args += ["-preset", "veryfast", "-crf", "23"] if codec == "libx264" else ["-q:v", "5"]
+    tmp = path.with_name(path.stem + ".tmp" + path.suffix)
+    proc = subprocess.run(
+        ["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=25",
+         "-frames:v", str(frames), *codec_args, "-threads", "1", "-fflags", "+bitexact", str(tmp)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {proc.stderr.strip()}")
+    os.replace(tmp, path)
+
+
+def prepare(data_dir, cases):
+    """Generate missing test videos; returns {case: path}."""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    paths = {}
+    for name in cases:
+        size, frames, codec, gop = CASES[name]
+        path = data_dir / f"{name}_{size}_{frames}f_g{gop}.mp4"
+        if not path.exists():
+            print(f"[bench] generating {path.name}")
+            make_video(path, size, frames, codec, gop)
+        paths[name] = path
+    return paths
+
+
+def run_entry(entry, in_path, env):
+    """Run one script once; returns its metrics."""
+    script, argv = ENTRIES[entry]
+    with tempfile.TemporaryDirectory() as out:
+        prof = Path(out) / "profile.jsonl"
+        cmd = [sys.executable, str(HERE / script)]
+        cmd += [a.replace("{in}", str(in_path)).replace("{out}", out) for a in argv]
+        cmd += ["--profile", str(prof)]
+        t0 = time.perf_counter()
+        proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, env=env)
+        wall = time.perf_counter() - t0
+        if proc.returncode != 0:
+            raise RuntimeError(f"{script} failed: {proc.stderr.strip()[-500:]}")
+        p = json.loads(prof.read_text().splitlines()[-1])
+    return {"wall_s": wall, "run_s": p["wall_s"],
+            "peak_rss_mb": max(p["peak_rss_mb"], p["peak_rss_children_mb"])}
+
+
+def run_suite(data_dir, cases, entries, repeat):
+    paths = prepare(data_dir, cases)
+    env = dict(os.environ, VIDEO_INDEX_DB=str(data_dir / "index.sqlite"))
+    results = {}
+    for case, path in paths.items():
+        frames = CASES[case][1]
+        for entry in entries:
+            runs = [run_entry(entry, path, env) for _ in range(repeat)]
+            med = {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+            results[f"{case}/{entry}"] = {
+                "wall_s": round(med["wall_s"], 4),
+                "run_s": round(med["run_s"], 4),
+                "fps": round(frames / med["run_s"], 1) if med["run_s"] else None,
+                "peak_rss_mb": round(med["peak_rss_mb"], 1),
+            }
+            r = results[f"{case}/{entry}"]
+            print(f"{case + '/' + entry:<36} {r['run_s']:8.3f}s  {r['fps'] or 0:9.1f} fps  "
+                  f"{r['peak_rss_mb']:8.1f} MB")
+    return results
+
+
+def machine_info():
+    ffmpeg = subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, text=True).stdout.split("\n")[0]
+    try:
+        import cv2
+        opencv = cv2.__version__
+    except ImportError:
+        opencv = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "ffmpeg": ffmpeg, "opencv": opencv}
+
+
+def compare(results, baseline, threshold):
+    """Print per-entry changes against a baseline; returns the keys that regressed."""
+    regressed = []
+    for key in sorted(results):
+        if key not in baseline:
+            print(f"{key:<36} new")
+            continue
+        old, new = baseline[key]["run_s"], results[key]["run_s"]
+        ratio = new / old if old else float("inf")
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "  REGRESSION"
+            regressed.append(key)
+        elif ratio < 1 - threshold:
+            mark = "  faster"
+        mem = results[key]["peak_rss_mb"] - baseline[key]["peak_rss_mb"]
+        print(f"{key:<36} {old:8.3f}s -> {new:8.3f}s  ({ratio:5.2f}x)  mem {mem:+7.1f} MB{mark}")
+    return regressed
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark every script on synthetic videos.")
+    ap.add_argument("--data", type=Path, default=DEFAULT_DATA,
+                    help=f"Directory for the generated test videos (default: {DEFAULT_DATA})")
+    ap.add_argument("--cases", default=",".join(CASES), help="Comma-separated test videos (default: all)")
+    ap.add_argument("--entries", default=",".join(ENTRIES), help="Comma-separated scripts (default: all)")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per entry; the median is kept (default: 3)")
+    ap.add_argument("--save", type=Path, default=None, help="Write the results as a JSON baseline")
+    ap.add_argument("--compare", type=Path, default=None, help="Baseline JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.10,
+                    help="Relative slowdown counted as a regression (default: 0.10)")
+    args = ap.parse_args()
+
+    cases = [c for c in args.cases.split(",") if c]
+    entries = [e for e in args.entries.split(",") if e]
+    unknown = [c for c in cases if c not in CASES] + [e for e in entries if e not in ENTRIES]
+    if unknown:
+        ap.error(f"unknown cases/entries: {unknown}")
+
+    results = run_suite(args.data, cases, entries, args.repeat)
+    if args.save:
+        doc = {"machine": machine_info(), "repeat": args.repeat, "cases": {c: CASES[c] for c in cases},
+               "results": results}
+        args.save.write_text(json.dumps(doc, indent=2, sort_keys=True) + "\n")
+        print(f"Saved baseline to {args.save}")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if baseline.get("machine", {}).get("cpus") != os.cpu_count():
+            print("[bench] note: baseline was recorded on a machine with a different CPU count")
+        regressed = compare(results, baseline["results"], args.threshold)
+        if regressed:
+            print(f"{len(regressed)} regression(s) above {args.threshold:.0%}")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
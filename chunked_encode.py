@@ -0,0 +1,170 @@
+# chunked_encode.py
+# pip install opencv-python
+#
+# Re-encode long videos with every core: the input is cut at keyframes into independent
+# frame ranges, each range is decoded (OpenCV seek), optionally resized and encoded
+# (FFmpegWriter, H.264) by its own worker process, and the encoded segments are joined
+# with the concat demuxer (stream copy, lossless). Output frames are the input frames in
+# the same order and number as the serial decode -> encode path.
+#   python chunked_encode.py long.mp4 -o out.mp4 --workers 8
+#   python chunked_encode.py a.mp4 b.mp4 -o joined.mp4 --size 1280x720
+#
+# Used by concat_vid.py (--chunked) and by viewable.py's transcode fallback (--chunked).
+
+import argparse
+import bisect
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+
+import profiling
+from resize_video_81 import parse_size
+from video_index import video_info
+from video_io import FFmpegWriter
+
+MIN_CHUNK_FRAMES = 250  # below this, encoder start-up costs more than the split saves
+
+
+def plan_chunks(frame_count, keyframes=None, chunks=4, min_frames=MIN_CHUNK_FRAMES):
+    """
+    Split frames 0..frame_count-1 into at most `chunks` ranges [(start, end), ...] (end
+    exclusive) of roughly equal length. Cuts are moved to the nearest keyframe when the
+    keyframe index is known, so each worker's seek lands on a keyframe and decodes nothing
+    twice; without one they stay where they are (OpenCV seeks are still frame-exact).
+    """
+    chunks = max(1, min(chunks, frame_count // max(min_frames, 1)))
+    cuts = []
+    for i in range(1, chunks):
+        cut = round(i * frame_count / chunks)
+        if keyframes:
+            j = bisect.bisect_left(keyframes, cut)
+            cut = min(keyframes[max(j - 1, 0):j + 1], key=lambda k: abs(k - cut))
+        if (cuts[-1] if cuts else 0) + min_frames <= cut <= frame_count - min_frames:
+            cuts.append(cut)
+    bounds = [0] + cuts + [frame_count]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def encode_chunk(input, start, end, out_path, fps, size, threads=0):
+    """
+    Worker: decode frames [start, end) of input (end=None: to the end of the file), resize
+    to size and encode them to out_path. Returns the number of frames written.
+    """
+    cap = cv2.VideoCapture(str(input))
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video: {input}")
+    if start > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    out = FFmpegWriter(out_path, fps, size, output_args=("-threads", str(threads)))
+    n = 0
+    try:
+        while end is None or n < end - start:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if (frame.shape[1], frame.shape[0]) != size:
+                frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            out.write(frame)
+            n += 1
+    finally:
+        cap.release()
+        out.release()
+    if end is None and n == 0:
+        raise RuntimeError(f"{input}: expected frames from {start} on, decoded none")
+    if end is not None and n != end - start:
+        raise RuntimeError(f"{input}: expected frames {start}..{end - 1}, decoded {n}")
+    return n
+
+
+def _worker_init():
+    cv2.setNumThreads(1)
+
+
+def _plan_jobs(inputs, infos, chunks, min_frames):
+    jobs = []
+    for p, info in zip(inputs, infos):
+        frame_count = info["frame_count"] or info["nb_frames"]
+        if not frame_count:
+            raise RuntimeError(f"Input video has 0 frames: {p}")
+        ranges = plan_chunks(frame_count, info["keyframes"], chunks, min_frames)
+        if not info["frame_count"]:
+            ranges[-1] = (ranges[-1][0], None)  # a header count may be a little off; read to the end
+        jobs += [(p, start, end) for start, end in ranges]
+    return jobs
+
+
+def encode_chunked(inputs, output, fps=None, size=None, workers=None, chunks_per_worker=2,
+                   min_frames=MIN_CHUNK_FRAMES):
+    """
+    Decode + encode `inputs` (one path or a list, joined in order) into `output` with a
+    process pool, one keyframe-aligned chunk per job.
+    - fps: output frame rate (default: the first input's r_frame_rate / fps, else 25)
+    - size: output (w, h) (default: the first input's size; others are resized to it)
+    Chunks are planned from the index's packet scan, or without ffprobe from the container
+    frame count, so nothing is decoded before the workers start; the last chunk of such an
+    input reads to the end. If another chunk comes up short (a header count that is far
+    off), those inputs are counted exactly (full decode) and the encode is run again.
+    Returns a dict of stats; raises RuntimeError if the output frame count does not match.
+    """
+    if isinstance(inputs, (str, os.PathLike)):
+        inputs = [inputs]
+    infos = [video_info(p, need_frames=True, cheap_only=True) for p in inputs]
+    first = infos[0]
+    fps = fps or first["r_frame_rate"] or first["fps"] or 25.0
+    size = tuple(size or (first["width"], first["height"]))
+    workers = workers or os.cpu_count() or 1
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    from concat_vid import concat_copy  # concat_vid imports this module for --chunked
+
+    t0 = time.perf_counter()
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    while True:
+        jobs = _plan_jobs(inputs, infos, workers * chunks_per_worker, min_frames)
+        with tempfile.TemporaryDirectory(dir=output.parent) as tmp:
+            parts = [Path(tmp) / f"part_{i:05d}.mp4" for i in range(len(jobs))]
+            try:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init) as pool:
+                    futures = [pool.submit(encode_chunk, p, start, end, part, fps, size, threads)
+                               for (p, start, end), part in zip(jobs, parts)]
+                    total = sum(fut.result() for fut in futures)
+            except RuntimeError as e:
+                if all(info["frame_count"] for info in infos):
+                    raise
+                print(f"Chunk plan from the container frame count failed ({e}); counting frames exactly.")
+                infos = [info if info["frame_count"] else video_info(p, need_frames=True)
+                         for p, info in zip(inputs, infos)]
+                continue
+            concat_copy(parts, output)
+        break
+    written = video_info(output, need_frames=True, cheap_only=True)
+    written = written["frame_count"] or written["nb_frames"]
+    if written != total:
+        raise RuntimeError(f"Chunked encode wrote {written} frames, expected {total}")
+    return {"frames": total, "chunks": len(jobs), "workers": workers, "fps": fps,
+            "size": f"{size[0]}x{size[1]}", "seconds": round(time.perf_counter() - t0, 3)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Re-encode (and join) videos in keyframe-aligned chunks in parallel.")
+    ap.add_argument("inputs", type=Path, nargs="+", help="Input videos, joined in order")
+    ap.add_argument("-o", "--output", type=Path, required=True, help="Output MP4 path")
+    ap.add_argument("--fps", default=None, help="Output FPS, number or fraction (default: first input's)")
+    ap.add_argument("--size", type=parse_size, default=None, help="Output size WxH (default: first input's)")
+    ap.add_argument("--workers", type=int, default=None, help="Encoder processes (default: CPUs)")
+    profiling.add_argument(ap)
+    args = ap.parse_args()
+    profiling.setup(args.profile)
+
+    stats = encode_chunked(args.inputs, args.output, fps=args.fps, size=args.size, workers=args.workers)
+    print(f"Saved {stats['frames']} frames to {args.output}  ({stats['size']}, {stats['chunks']} chunks "
+          f"on {stats['workers']} workers, {stats['seconds']:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
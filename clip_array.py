@@ -0,0 +1,121 @@
+# clip_array.py
+#
+# Fixed-length clips as memory-mappable .npy files (T x H x W x 3, uint8, BGR like OpenCV).
+# Data loaders can np.load(path, mmap_mode="r") a clip and index frames without decoding
+# or copying; the OS page cache does the rest.
+# The .npy header only allows numpy's own keys, so clip metadata (fps, source, size, ...)
+# is stored as a small JSON trailer after the array data. numpy ignores trailing bytes, so
+# the files stay plain .npy for any other reader.
+#   python clip_array.py clip_81.npy        # print shape and metadata
+#
+# Written by the scripts whenever the output path ends in .npy (see video_io.open_writer).
+
+import argparse
+import io
+import json
+import os
+
+import numpy as np
+
+HEADER_BYTES = 128  # npy v1.0 header for a 4-d uint8 array, padded to numpy's 64-byte alignment
+_TRAILER_MAGIC = b"CLIPMETA"
+
+
+class ClipArrayWriter:
+    """
+    Write frames of one size into a .npy file, one frame at a time (constant memory).
+    The header is written on release(), when the frame count is known, followed by the
+    metadata trailer. Same write()/release() interface as cv2.VideoWriter.
+    - meta: extra JSON-serialisable metadata (e.g. {"source": "in.mp4"})
+    """
+
+    def __init__(self, out_path, fps, size, meta=None):
+        w, h = size
+        self.out_path = out_path
+        self.size = (int(w), int(h))
+        self.meta = {"fps": float(fps), "width": self.size[0], "height": self.size[1], **(meta or {})}
+        self.frames = 0
+        self._released = False
+        self.f = open(out_path, "wb")
+        self.f.write(b"\0" * HEADER_BYTES)
+
+    def isOpened(self):
+        return not self._released
+
+    def write(self, frame):
+        w, h = self.size
+        if frame.shape != (h, w, 3) or frame.dtype != np.uint8:
+            raise RuntimeError(f"Frame {frame.shape} {frame.dtype} does not match clip size {w}x{h} uint8")
+        self.f.write(np.ascontiguousarray(frame).data)
+        self.frames += 1
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        try:
+            w, h = self.size
+            header = io.BytesIO()
+            np.lib.format.write_array_header_1_0(
+                header, {"descr": "|u1", "fortran_order": False, "shape": (self.frames, h, w, 3)})
+            if len(header.getvalue()) != HEADER_BYTES:
+                raise RuntimeError(f"Unexpected .npy header size {len(header.getvalue())}")
+            self.meta["frames"] = self.frames
+            blob = json.dumps(self.meta, sort_keys=True).encode()
+            self.f.write(blob + _TRAILER_MAGIC + len(blob).to_bytes(8, "little"))
+            self.f.seek(0)
+            self.f.write(header.getvalue())
+        finally:
+            self.f.close()
+
+
+def write_clip_array(frames, out_path, fps, meta=None):
+    """Write a list of equally sized frames to out_path (.npy) via ClipArrayWriter."""
+    if not frames:
+        raise RuntimeError("No frames to write.")
+    h, w = frames[0].shape[:2]
+    out = ClipArrayWriter(out_path, fps, (w, h), meta=meta)
+    try:
+        for f in frames:
+            out.write(f)
+    finally:
+        out.release()
+
+
+def clip_meta(path):
+    """Metadata trailer of a clip .npy ({} for a plain .npy without one)."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        tail = len(_TRAILER_MAGIC) + 8
+        if end < HEADER_BYTES + tail:
+            return {}
+        f.seek(end - tail)
+        magic_len = f.read(tail)
+        if magic_len[:len(_TRAILER_MAGIC)] != _TRAILER_MAGIC:
+            return {}
+        n = int.from_bytes(magic_len[len(_TRAILER_MAGIC):], "little")
+        f.seek(end - tail - n)
+        return json.loads(f.read(n))
+
+
+def load_clip(path, mmap=True):
+    """
+    Open a clip .npy. Returns (frames, meta); with mmap (default) frames is a read-only
+    np.memmap, so frames[i] touches only that frame's pages.
+    """
+    frames = np.load(path, mmap_mode="r" if mmap else None)
+    return frames, clip_meta(path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Show the shape and metadata of clip .npy files.")
+    ap.add_argument("paths", nargs="+", help="Clip .npy files")
+    args = ap.parse_args()
+    for p in args.paths:
+        frames, meta = load_clip(p)
+        print(json.dumps({"path": p, "shape": list(frames.shape), **meta}))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,29 @@
 
 import cv2
 import argparse
+import os
+import subprocess
+import tempfile
 from pathlib import Path
 
+import profiling
+from video_index import video_info
+from video_io import WRITER_BACKENDS, FFmpegWriter, FrameReader, open_writer
+
+# Stream properties that must match for the concat demuxer to join without re-encoding
+COMPAT_KEYS = ("codec_name", "width", "height", "pix_fmt", "time_base", "r_frame_rate")
+
 def open_video(p):
     cap = cv2.VideoCapture(str(p))
     if not cap.isOpened():
         raise RuntimeError(f"Cannot open video: {p}")
-    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
-    w   = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    h   = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    return cap, fps, (w, h)
+    profiling.count_file("bytes_in", p)
+    info = video_info(p)
+    fps = info["fps"] or 0.0
+    w   = info["width"]
+    h   = info["height"]
+    # Decode ahead on a background thread while the caller resizes/encodes
+    return FrameReader(cap), fps, (w, h)
 
 def read_and_write(cap, writer, target_size=None):
     """Read all frames from cap; optionally resize to target_size; write to writer."""
@@ -21,38 +34,137 @@ def read_and_write(cap, writer, target_size=None):
         if not ok:
             break
         if target_size is not None and (frame.shape[1], frame.shape[0]) != target_size:
-            frame = cv2.resize(frame, target_size, interpolation=cv2.INTER_AREA)
+            with profiling.stage("resize"):
+                frame = cv2.resize(frame, target_size, interpolation=cv2.INTER_AREA)
         writer.write(frame)
 
+def probe_stream(p):
+    """First video stream's COMPAT_KEYS from the video index, or None if they are unknown."""
+    try:
+        info = video_info(p)
+    except (OSError, RuntimeError):
+        return None
+    probe = {k: info.get("codec" if k == "codec_name" else k) for k in COMPAT_KEYS}
+    if any(v is None for v in probe.values()):
+        return None  # OpenCV fallback record: no pix_fmt / timebase
+    return probe
+
+def _concat_line(p):
+    # concat demuxer list syntax: single-quoted, with ' escaped as '\''
+    return "file '" + str(Path(p).resolve()).replace("'", "'\\''") + "'\n"
+
+def concat_copy(videos, output):
+    """Join inputs with the ffmpeg concat demuxer and stream copy (video only, no re-encode)."""
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+        f.writelines(_concat_line(p) for p in videos)
+        list_path = f.name
+    try:
+        with profiling.stage("ffmpeg"):
+            proc = subprocess.run(
+                ["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+                 "-map", "0:v:0", "-c", "copy", "-movflags", "+faststart", str(output)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    finally:
+        os.unlink(list_path)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg concat failed: {proc.stderr.strip()}")
+
+def _encode_matching(p, out_path, ref):
+    """Decode p (current OpenCV path) and re-encode it with the reference stream's parameters."""
+    size = (int(ref["width"]), int(ref["height"]))
+    timescale = ref["time_base"].split("/")[-1]
+    cap, _, _ = open_video(p)
+    out = FFmpegWriter(out_path, ref["r_frame_rate"], size,
+                       output_args=("-video_track_timescale", timescale))
+    try:
+        read_and_write(cap, out, target_size=size)
+    finally:
+        cap.release()
+        out.release()
+
+def concat_probed(videos, output):
+    """
+    Stream-copy fast path. Inputs whose stream matches the first one are joined as-is; only
+    the ones that differ are decoded and re-encoded to match (H.264 yuv420p references only).
+    Returns the number of re-encoded inputs, or None if the fast path does not apply.
+    """
+    probes = [probe_stream(p) for p in videos]
+    ref = probes[0]
+    if ref is None or any(pr is None for pr in probes):
+        return None
+    mismatched = [i for i, pr in enumerate(probes) if pr != ref]
+    if mismatched and (ref["codec_name"] != "h264" or ref["pix_fmt"] != "yuv420p"):
+        return None  # FFmpegWriter only produces H.264 yuv420p segments
+
+    with tempfile.TemporaryDirectory() as tmp:
+        parts = list(videos)
+        for i in mismatched:
+            parts[i] = Path(tmp) / f"part_{i:05d}.mp4"
+            _encode_matching(videos[i], parts[i], ref)
+        concat_copy(parts, output)
+    return len(mismatched)
+
+def concat_decode(videos, output, fps=None, backend="cv2"):
+    """Decode every input, resize to the first one's size and re-encode into one file."""
+    caps = [open_video(p) for p in videos]
+    _, fps1, size1 = caps[0]
+
+    # Decide output fps
+    out_fps = fps if fps and fps > 0 else (fps1 if fps1 and fps1 > 1e-3 else 25.0)
+
+    # Output size = size of the first video; resize the others to match
+    out_w, out_h = size1
+    try:
+        out = open_writer(output, out_fps, (out_w, out_h), backend=backend)
+    except RuntimeError:
+        for cap, _, _ in caps:
+            cap.release()
+        raise
+
+    # Write frames from each video in order
+    for cap, _, _ in caps:
+        read_and_write(cap, out, target_size=(out_w, out_h))     # resized if needed
+        cap.release()
+    out.release()
+    return out_fps, (out_w, out_h)
+
 def main():
-    ap = argparse.ArgumentParser(description="Concatenate two videos end-to-end into one MP4.")
-    ap.add_argument("video1", type=Path, help="First input video")
-    ap.add_argument("video2", type=Path, help="Second input video")
+    ap = argparse.ArgumentParser(description="Concatenate videos end-to-end into one MP4.")
+    ap.add_argument("videos", type=Path, nargs="+", help="Input videos, in order")
     ap.add_argument("-o", "--output", type=Path, default=Path("concat.mp4"),
                     help="Output video path (default: concat.mp4)")
     ap.add_argument("--fps", type=float, default=None,
-                    help="Output FPS (default: use FPS of the first video, or 25 if unknown)")
+                    help="Output FPS (default: use FPS of the first video, or 25 if unknown). "
+                         "Forces the decode path.")
+    ap.add_argument("--writer", choices=WRITER_BACKENDS, default="cv2",
+                    help="Encoder backend for the decode path: cv2 (mp4v) or ffmpeg "
+                         "(libx264, browser-playable; default: cv2)")
+    ap.add_argument("--chunked", action="store_true",
+                    help="Decode path: encode keyframe-aligned chunks in parallel worker processes "
+                         "(H.264 via ffmpeg) and join them losslessly")
+    ap.add_argument("--workers", type=int, default=None,
+                    help="Worker processes for --chunked (default: number of CPUs)")
+    ap.add_argument("--no-copy", action="store_true",
+                    help="Always decode and re-encode every input (skip the stream-copy fast path)")
+    profiling.add_argument(ap)
     args = ap.parse_args()
+    profiling.setup(args.profile)
 
-    cap1, fps1, size1 = open_video(args.video1)
-    cap2, fps2, size2 = open_video(args.video2)
-
-    # Decide output fps
-    out_fps = args.fps if args.fps and args.fps > 0 else (fps1 if fps1 and fps1 > 1e-3 else 25.0)
-
-    # Output size = size of video1; resize video2 to match
-    out_w, out_h = size1
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    out = cv2.VideoWriter(str(args.output), fourcc, out_fps, (out_w, out_h))
-    if not out.isOpened():
-        cap1.release(); cap2.release()
-        raise RuntimeError(f"Cannot open output for writing: {args.output}")
+    if not args.no_copy and not args.fps:
+        reencoded = concat_probed(args.videos, args.output)
+        if reencoded is not None:
+            print(f"Saved: {args.output}  (stream copy, {len(args.videos)} inputs, "
+                  f"{reencoded} re-encoded to match)")
+            return
 
-    # Write frames from video1 and then video2
-    read_and_write(cap1, out, target_size=(out_w, out_h))     # already matches
-    read_and_write(cap2, out, target_size=(out_w, out_h))     # resized if needed
+    if args.chunked:
+        from chunked_encode import encode_chunked
+        stats = encode_chunked(args.videos, args.output, fps=args.fps, workers=args.workers)
+        print(f"Saved: {args.output}  (size: {stats['size']}, fps: {stats['fps']}, "
+              f"{stats['chunks']} chunks on {stats['workers']} workers)")
+        return
 
-    cap1.release(); cap2.release(); out.release()
+    out_fps, (out_w, out_h) = concat_decode(args.videos, args.output, fps=args.fps, backend=args.writer)
     print(f"Saved: {args.output}  (size: {out_w}x{out_h}, fps: {out_fps:.2f})")
 
 if __name__ == "__main__":
@@ -1,33 +1,153 @@
 import yt_dlp
+import argparse
+import json
 import os
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from yt_dlp.utils import download_range_func
 
-#download the video and cut it by ffmpeg (too bad for spp)
+import profiling
+from video_index import video_info
 
-def download_and_trim(url, output_path="./video_data"):
+# Fetch only the wanted section (yt_dlp download_ranges -> ffmpeg reads just that range),
+# name every clip after its video id, and run many URLs concurrently.
+
+FORMAT = "bv*[vcodec^=avc1]+ba/best[ext=mp4]"
+
+def _is_local(src):
+    return src.startswith("file://") or os.path.exists(src)
+
+def _trim_local(src, out_file, start, end):
+    # Local files (and offline tests): same stream-copy cut as before, no download step
+    if src.startswith("file://"):
+        src = src[len("file://"):]
+    with profiling.stage("ffmpeg"):
+        proc = subprocess.run([
+            "ffmpeg", "-y", "-v", "error",
+            "-ss", str(start), "-to", str(end),
+            "-i", src,
+            "-c", "copy", out_file
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {proc.stderr.strip()}")
+    return out_file
+
+def download_section(url, output_path="./video_data", start=2, end=7, name=None, exact_cuts=False):
+    """
+    Download only seconds [start, end] of `url` to <output_path>/<name>.mp4.
+    - name: output file stem (default: the video id, so concurrent runs never collide)
+    - exact_cuts: re-encode around the cut points so the clip starts exactly at `start`
+      (default: stream copy, cut at keyframes like the old ffmpeg -c copy trim)
+    Local paths / file:// URLs are cut directly with ffmpeg.
+    Returns the path of the saved clip.
+    """
     os.makedirs(output_path, exist_ok=True)
-    temp_file = os.path.join(output_path, "full.mp4")
-    final_file = os.path.join(output_path, "clip.mp4")
+    if _is_local(url):
+        stem = name or Path(url).stem
+        out_file = _trim_local(url, os.path.join(output_path, stem + ".mp4"), start, end)
+        profiling.count_file("bytes_out", out_file)
+        return out_file
 
     ydl_opts = {
-        "format": "bv*[vcodec^=avc1]+ba/best[ext=mp4]",
-        "outtmpl": temp_file,
-        "merge_output_format": "mp4"
+        "format": FORMAT,
+        "outtmpl": os.path.join(output_path, (name or "%(id)s") + ".%(ext)s"),
+        "merge_output_format": "mp4",
+        "download_ranges": download_range_func(None, [(start, end)]),
+        "force_keyframes_at_cuts": exact_cuts,
+        "quiet": True,
+        "noprogress": True,
     }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl, profiling.stage("download"):
+        info = ydl.extract_info(url, download=True)
+    downloads = info.get("requested_downloads") or [{}]
+    out_file = downloads[0].get("filepath") or ydl.prepare_filename(info)
+    # A server without HTTP range support can make ffmpeg produce an empty section
+    if not video_info(out_file, need_frames=True)["frame_count"]:
+        raise RuntimeError(f"Downloaded section has no video frames: {out_file}")
+    profiling.count_file("bytes_out", out_file)
+    return out_file
 
+def download_and_trim(url, output_path="./video_data"):
+    """Old entry point: seconds 2–7 of `url` saved as <output_path>/clip.mp4 (now section-only)."""
+    final_file = download_section(url, output_path, start=2, end=7, name="clip")
+    print(f"✅ Saved segment to {final_file}")
+    return final_file
 
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        ydl.download([url])
+def download_many(urls, output_path="./video_data", start=2, end=7, workers=4, retries=3,
+                  backoff=2.0, exact_cuts=False, manifest=None):
+    """
+    download_section for every URL with at most `workers` downloads in flight.
+    Each URL is retried up to `retries` times with exponential backoff.
+    Results (one dict per URL: input, output, status, attempts, seconds[, error]) are
+    returned and, if `manifest` is given, appended to it as JSON lines.
+    """
+    lock = threading.Lock()
+    mf = open(manifest, "a") if manifest else None
 
-    # Trim with ffmpeg: from 1s to 25s
-    subprocess.run([
-        "ffmpeg", "-y",
-        "-ss", "2", "-to", "7",
-        "-i", temp_file,
-        "-c", "copy", final_file
-    ])
+    def job(url):
+        t0 = time.perf_counter()
+        rec = {"input": url, "output": None, "status": "error"}
+        for attempt in range(1, retries + 1):
+            rec["attempts"] = attempt
+            try:
+                rec["output"] = download_section(url, output_path, start, end, exact_cuts=exact_cuts)
+                rec["status"] = "ok"
+                rec.pop("error", None)
+                break
+            except Exception as e:
+                rec["error"] = f"{type(e).__name__}: {e}"
+                if attempt < retries:
+                    time.sleep(backoff * 2 ** (attempt - 1))
+        rec["seconds"] = round(time.perf_counter() - t0, 3)
+        if mf:
+            with lock:
+                mf.write(json.dumps(rec) + "\n")
+                mf.flush()
+        return rec
 
-    print(f"✅ Saved segment to {final_file}")
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(job, u) for u in urls]
+            for fut in as_completed(futures):
+                rec = fut.result()
+                results.append(rec)
+                mark = "✅" if rec["status"] == "ok" else "❌"
+                print(f"{mark} {rec['input']} -> {rec['output'] or rec.get('error')}")
+    finally:
+        if mf:
+            mf.close()
+    return results
 
 if __name__ == "__main__":
-    download_and_trim("https://www.youtube.com/watch?v=3FXUw98rrUY")
+    ap = argparse.ArgumentParser(description="Download a short section of one or more videos.")
+    ap.add_argument("urls", nargs="*", help="Video URLs (or local paths)")
+    ap.add_argument("--list", type=Path, default=None, help="Text file with one URL per line")
+    ap.add_argument("-o", "--output", default="./video_data", help="Output directory (default: ./video_data)")
+    ap.add_argument("--start", type=float, default=2, help="Section start in seconds (default: 2)")
+    ap.add_argument("--end", type=float, default=7, help="Section end in seconds (default: 7)")
+    ap.add_argument("--workers", type=int, default=4, help="Concurrent downloads (default: 4)")
+    ap.add_argument("--retries", type=int, default=3, help="Attempts per URL (default: 3)")
+    ap.add_argument("--exact-cuts", action="store_true",
+                    help="Re-encode around the cuts for frame-exact section boundaries")
+    ap.add_argument("--manifest", default=None, help="Append per-URL results to this JSONL file")
+    profiling.add_argument(ap)
+    args = ap.parse_args()
+    profiling.setup(args.profile)
+
+    urls = list(args.urls)
+    if args.list:
+        urls += [l.strip() for l in args.list.read_text().splitlines()
+                 if l.strip() and not l.startswith("#")]
+    if not urls:
+        ap.error("no URLs given")
+
+    results = download_many(urls, args.output, args.start, args.end, workers=args.workers,
+                            retries=args.retries, exact_cuts=args.exact_cuts, manifest=args.manifest)
+    failed = sum(r["status"] != "ok" for r in results)
+    print(f"Done: {len(results) - failed} ok, {failed} failed")
+    if failed:
+        raise SystemExit(1)
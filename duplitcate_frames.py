@@ -1,36 +1,31 @@
 # save as duplicate_each_frame.py
 # pip install opencv-python
 
-import cv2
 import argparse
+import os
+import subprocess
 from pathlib import Path
 
+from batch import tmp_path_for
+import profiling
+from video_index import scan_video, video_info
+from video_io import WRITER_BACKENDS, FrameReader, open_writer
+
 def read_all_frames(video_path):
-    cap = cv2.VideoCapture(str(video_path))
-    if not cap.isOpened():
-        raise RuntimeError(f"Cannot open video: {video_path}")
+    cap = FrameReader(video_path)
 
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    if not fps or fps <= 1e-3:
-        fps = 25.0  # sensible default
+    fps = video_info(video_path)["fps"] or 25.0  # sensible default
 
-    frames = []
-    ok, frame = cap.read()
-    while ok:
-        frames.append(frame)
-        ok, frame = cap.read()
+    frames = list(cap)
 
     cap.release()
     if not frames:
         raise RuntimeError("Input video has 0 frames.")
     return frames, fps
 
-def write_video(frames, out_path, fps):
+def write_video(frames, out_path, fps, backend="cv2"):
     h, w = frames[0].shape[:2]
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")  # widely supported
-    out = cv2.VideoWriter(str(out_path), fourcc, fps, (w, h))
-    if not out.isOpened():
-        raise RuntimeError(f"Cannot open output for writing: {out_path}")
+    out = open_writer(out_path, fps, (w, h), backend=backend)  # mp4v, widely supported
     for f in frames:
         out.write(f)
     out.release()
@@ -44,6 +39,83 @@ def duplicate_each_frame(frames, factor=2):
         out.extend([f] * factor)
     return out
 
+def duplicate_stream(video_path, out_path, factor=2, keep_fps=False, backend="cv2"):
+    """
+    Same output as read_all_frames + duplicate_each_frame + write_video, but each decoded
+    frame is written `factor` times straight away, so nothing is held in memory.
+    Returns (input frames, output frames, output fps).
+    """
+    if factor < 1:
+        raise ValueError("factor must be >= 1")
+    fps = video_info(video_path)["fps"] or 25.0  # sensible default
+    out_fps = fps if keep_fps else fps * factor
+    cap = FrameReader(video_path)
+    out = None
+    n = 0
+    try:
+        for f in cap:
+            if out is None:
+                h, w = f.shape[:2]
+                out = open_writer(out_path, out_fps, (w, h), backend=backend)
+            for _ in range(factor):
+                out.write(f)
+            n += 1
+    finally:
+        cap.release()
+        if out is not None:
+            out.release()
+    if n == 0:
+        raise RuntimeError("Input video has 0 frames.")
+    return n, n * factor, out_fps
+
+def retime_copy(video_path, out_path, factor=2, keep_fps=True):
+    """
+    Zero-decode version of duplicate_stream(keep_fps=True): the packets are stream-copied
+    and every timestamp and duration is multiplied by `factor` (setts bitstream filter), so
+    each frame is shown `factor` times as long. The file holds the input's frames at
+    fps / factor and plays back like factor * frames at the input fps.
+    Without keep_fps (fps * factor, same duration) there is nothing a copy can change, so
+    that mode always needs duplicate_stream.
+    Parity with the encode path is checked on the written file: same frame count as the
+    input, and the display time of factor * frames at the input fps (within half a frame).
+    Frame counts come from an ffprobe packet scan, else from the container headers, so
+    neither file is decoded.
+    Raises RuntimeError if ffmpeg cannot copy the codec or the check fails.
+    Returns (input frames, output frames, output fps).
+    """
+    if not keep_fps:
+        raise ValueError("retime_copy only supports keep_fps=True (a copy cannot add frames)")
+    if factor < 1:
+        raise ValueError("factor must be >= 1")
+    info = video_info(video_path, need_frames=True, cheap_only=True)
+    n, fps = info["frame_count"] or info["nb_frames"], info["fps"]
+    if not n or not fps:
+        raise RuntimeError("Frame count / fps unknown; cannot check the retimed copy.")
+    expected = n * factor / fps  # duration of duplicate_stream's output
+
+    out_path = Path(out_path)
+    tmp = tmp_path_for(out_path)
+    cmd = ["ffmpeg", "-y", "-v", "error", "-i", str(video_path), "-map", "0:v:0", "-c", "copy", "-an"]
+    if factor > 1:
+        cmd += ["-bsf:v", f"setts=pts=PTS*{factor}:dts=DTS*{factor}:duration=DURATION*{factor}"]
+    cmd.append(str(tmp))
+    try:
+        with profiling.stage("ffmpeg"):
+            proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {proc.stderr.strip()}")
+        out = scan_video(tmp, cheap_only=True)  # not video_info: no index row for a temp file
+        n_out = out["frame_count"] or out["nb_frames"]
+        duration = out["duration"] or 0.0
+        if n_out != n or abs(duration - expected) > 0.5 / fps:
+            raise RuntimeError(f"Retimed copy does not match: {n_out} frames over {duration:.3f}s, "
+                               f"expected {n} frames over {expected:.3f}s")
+        os.replace(tmp, out_path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return n, n_out, out["fps"] or n / duration
+
 def main():
     parser = argparse.ArgumentParser(
         description="Duplicate every frame (N -> factor*N). Default factor=2."
@@ -56,16 +128,31 @@ def main():
     parser.add_argument("--keep-fps", action="store_true",
                         help="Keep original FPS (duration increases by `factor`). "
                              "By default, FPS is multiplied by `factor` to keep duration unchanged.")
+    parser.add_argument("--writer", choices=WRITER_BACKENDS, default="cv2",
+                        help="Encoder backend: cv2 (mp4v) or ffmpeg (libx264, browser-playable; default: cv2)")
+    parser.add_argument("--copy", action="store_true",
+                        help="With --keep-fps: no decode/encode, stream-copy and stretch the timestamps "
+                             "instead of repeating frames (same playback; falls back to encoding if the "
+                             "copy cannot match)")
+    profiling.add_argument(parser)
     args = parser.parse_args()
+    profiling.setup(args.profile)
+    if args.copy and not args.keep_fps:
+        parser.error("--copy needs --keep-fps (doubling the fps at the same duration needs new frames)")
 
-    frames, fps = read_all_frames(args.input)
-    dup_frames = duplicate_each_frame(frames, factor=args.factor)
-
-    out_fps = fps if args.keep_fps else fps * args.factor
-    write_video(dup_frames, args.output, out_fps)
+    how = "re-encoded"
+    if args.copy:
+        try:
+            n_in, n_out, out_fps = retime_copy(args.input, args.output, factor=args.factor, keep_fps=True)
+            how = f"stream copy, each frame shown {args.factor}x as long"
+        except RuntimeError as e:
+            print(f"Stream copy not possible ({e}); re-encoding.")
+    if how == "re-encoded":
+        n_in, n_out, out_fps = duplicate_stream(args.input, args.output, factor=args.factor,
+                                                keep_fps=args.keep_fps, backend=args.writer)
 
-    print(f"Done. Input frames: {len(frames)}, Output frames: {len(dup_frames)}, "
-          f"FPS: {out_fps:.2f}. Saved to {args.output}")
+    print(f"Done. Input frames: {n_in}, Output frames: {n_out}, "
+          f"FPS: {out_fps:.2f} ({how}). Saved to {args.output}")
 
 if __name__ == "__main__":
     main()
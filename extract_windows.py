@@ -0,0 +1,163 @@
+# extract_windows.py
+# pip install opencv-python
+#
+# Cut a long video into many fixed-length training clips (sliding windows) with one decode.
+# Calling trim_frame.py / resize_video_81.py once per window re-opens and re-decodes the
+# source every time; here the source is decoded once, each finished window is handed to a
+# process pool for encoding, and frames that fall in no window (stride > length) are
+# skipped with cap.grab() instead of being decoded to BGR.
+#   python extract_windows.py long.mp4 -o clips/                    # 81 frames, stride 81
+#   python extract_windows.py long.mp4 -o clips/ --stride 40 --pad  # overlapping, pad the tail
+#
+# Outputs are <out_dir>/<stem>_<start frame>.mp4 (or .npy with --format npy), listed with
+# their frame ranges in <out_dir>/windows.jsonl.
+
+import argparse
+import json
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import cv2
+
+from batch import tmp_path_for
+import profiling
+from resize_video_81 import OUTPUT_FORMATS, TARGET, parse_size
+from video_index import video_info
+from video_io import WRITER_BACKENDS, open_writer
+
+
+def encode_window(frames, output, fps, size=None, backend="ffmpeg", meta=None):
+    """Worker: write one window's frames to output (temp file + rename)."""
+    output = Path(output)
+    tmp = tmp_path_for(output)
+    h, w = frames[0].shape[:2]
+    out_size = size or (w, h)
+    try:
+        out = open_writer(tmp, fps, out_size, backend=backend, meta=meta)
+        try:
+            for f in frames:
+                if (f.shape[1], f.shape[0]) != out_size:
+                    f = cv2.resize(f, out_size, interpolation=cv2.INTER_AREA)
+                out.write(f)
+        finally:
+            out.release()
+        os.replace(tmp, output)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return str(output)
+
+
+def _worker_init():
+    # Several windows encode at once; avoid thread oversubscription.
+    cv2.setNumThreads(1)
+
+
+def extract_windows(input, out_dir, length=TARGET, stride=TARGET, pad=False, fps=None, size=None,
+                    backend="ffmpeg", fmt="mp4", workers=None):
+    """
+    Decode `input` once and write every window of `length` frames, starting every `stride`
+    frames, to out_dir. With pad, the first incomplete window at the end is padded with
+    the last frame (otherwise leftover frames are dropped).
+    At most 2 * workers windows are queued for encoding, and each is pickled whole to its
+    worker, so peak memory is about 2 * workers * length decoded frames (plus the window
+    being filled): ~3.6 GB for 8 workers of 81 frames at 720p. Lower --workers for large
+    frames or long windows.
+    Returns one record per window: {"input", "output", "start_frame", "end_frame", "padded"},
+    where end_frame is the last source frame in the window and padded the number of copies
+    of it appended to reach `length`.
+    """
+    if length < 1 or stride < 1:
+        raise ValueError("length and stride must be >= 1")
+    input, out_dir = Path(input), Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    fps = fps or video_info(input)["fps"] or 25.0
+    cap = cv2.VideoCapture(str(input))
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video: {input}")
+
+    workers = workers or os.cpu_count() or 1
+    records, pending = [], []
+    buf = deque(maxlen=length)
+    last = None
+
+    def submit(pool, frames, start, padded=0):
+        out = out_dir / f"{input.stem}_{start:06d}.{fmt}"
+        meta = {"source": str(input), "start_frame": start}
+        pending.append(pool.submit(encode_window, frames, out, fps, size, backend, meta))
+        records.append({"input": str(input), "output": str(out), "start_frame": start,
+                        "end_frame": start + length - 1 - padded, "padded": padded})
+        while len(pending) >= 2 * workers:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                fut.result()  # re-raise encode errors
+                pending.remove(fut)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init) as pool:
+        try:
+            i = 0
+            while cap.grab():
+                if i % stride < length:  # frame belongs to some window
+                    ok, frame = cap.retrieve()
+                    if not ok:
+                        break
+                    buf.append(frame)
+                    last = frame
+                    start = i - length + 1
+                    if start >= 0 and start % stride == 0:
+                        submit(pool, list(buf), start)
+                else:
+                    buf.clear()
+                i += 1
+            if last is None:
+                raise RuntimeError("Input video has 0 frames.")
+            tail = len(records) * stride
+            if pad and tail < i:
+                frames = list(buf)[len(buf) - (i - tail):]
+                submit(pool, frames + [last] * (length - len(frames)), tail, padded=length - len(frames))
+        finally:
+            cap.release()
+        for fut in pending:
+            fut.result()
+
+    with open(out_dir / "windows.jsonl", "w") as f:
+        for rec in records:
+            f.write(json.dumps(rec) + "\n")
+    return records
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Cut a long video into fixed-length windows with one decode pass.")
+    ap.add_argument("input", type=Path, help="Input video path")
+    ap.add_argument("-o", "--output", type=Path, default=Path("windows"),
+                    help="Output directory (default: windows/)")
+    ap.add_argument("--length", type=int, default=TARGET, help=f"Frames per window (default: {TARGET})")
+    ap.add_argument("--stride", type=int, default=None,
+                    help="Frames between window starts (default: --length, i.e. no overlap)")
+    ap.add_argument("--pad", action="store_true",
+                    help="Keep the incomplete last window, padded with its last frame")
+    ap.add_argument("--fps", type=float, default=None, help="Output FPS (default: input FPS or 25)")
+    ap.add_argument("--size", type=parse_size, default=None, help="Resize windows to WxH")
+    ap.add_argument("--writer", choices=WRITER_BACKENDS, default="ffmpeg",
+                    help="Encoder backend: ffmpeg (libx264, default) or cv2 (mp4v)")
+    ap.add_argument("--format", choices=OUTPUT_FORMATS, default="mp4",
+                    help="mp4 clips or npy frame arrays (default: mp4)")
+    ap.add_argument("--workers", type=int, default=None,
+                    help="Encoder processes (default: CPUs); up to 2 windows of decoded frames are "
+                         "held per worker")
+    profiling.add_argument(ap)
+    args = ap.parse_args()
+    profiling.setup(args.profile)
+
+    records = extract_windows(args.input, args.output, length=args.length, stride=args.stride or args.length,
+                              pad=args.pad, fps=args.fps, size=args.size, backend=args.writer,
+                              fmt=args.format, workers=args.workers)
+    padded = sum(1 for r in records if r["padded"])
+    print(f"Saved {len(records)} windows of {args.length} frames to {args.output}/"
+          + (f" ({padded} padded)" if padded else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# fanout.py
+# pip install opencv-python
+#
+# Derive several per-clip artifacts from one decode of the source:
+#   last_frame  <stem>_last.jpg    last frame as JPG           (get_frame.py)
+#   freeze      <stem>_freeze.mp4  first frame held for the clip length (make_freeze_vid.py)
+#   pad81       <stem>_81.mp4      first 81 frames, padded with the last (resize_video_81.py)
+# Each output is a sink fed from the same frame stream and keeps only what it needs (the
+# first frame, one frame for padding, ...). Decoding stops as soon as every sink is
+# satisfied; the last frame is then taken from the final GOP like get_frame.py does,
+# instead of decoding the rest of the clip.
+#   python fanout.py clip.mp4 -o out/                       # all outputs
+#   python fanout.py clip.mp4 -o out/ --outputs last_frame,pad81 --size 832x480
+#   python fanout.py clips/ --batch -o out/
+
+import argparse
+import os
+from pathlib import Path
+
+import cv2
+
+from batch import collect_inputs, output_path_for, run_batch, tmp_path_for
+from get_frame import read_last_frame, save_jpg
+from make_freeze_vid import _metadata_fps_and_frames
+import profiling
+from resize_video_81 import TARGET, parse_size
+from video_index import video_info
+from video_io import WRITER_BACKENDS, FrameReader, open_writer
+
+OUTPUTS = {"last_frame": "_last.jpg", "freeze": "_freeze.mp4", "pad81": "_81.mp4"}
+
+
+class _Sink:
+    """
+    Output fed one frame at a time; `done` once it needs no more frames.
+    finish(last) gets the final frame of the input, or None if decoding stopped early.
+    """
+    done = False
+
+    def __init__(self, out_path):
+        self.out_path = Path(out_path)
+        self.tmp = tmp_path_for(self.out_path)
+
+    def feed(self, frame):
+        pass
+
+    def _commit(self):
+        os.replace(self.tmp, self.out_path)
+
+    def abort(self):
+        if self.tmp.exists():
+            self.tmp.unlink()
+
+
+class LastFrameSink(_Sink):
+    """Last frame -> JPG. Taken from the stream at EOF, else read from the last GOP."""
+    done = True  # never keeps the decode going on its own
+
+    def __init__(self, out_path, input, quality=95):
+        super().__init__(out_path)
+        self.input = input
+        self.quality = quality
+
+    def finish(self, last):
+        frame = last if last is not None else read_last_frame(self.input)
+        save_jpg(frame, self.tmp, quality=self.quality)
+        self._commit()
+
+
+class FreezeSink(_Sink):
+    """First frame repeated for the input's frame count (as freeze_first_frame_cv)."""
+
+    def __init__(self, out_path, fps, nframes, backend="cv2"):
+        super().__init__(out_path)
+        self.fps = fps
+        self.nframes = nframes  # 0 = unknown: count the stream instead
+        self.backend = backend
+        self.first = None
+        self.seen = 0
+
+    def feed(self, frame):
+        if self.first is None:
+            self.first = frame
+        self.seen += 1
+        self.done = self.nframes > 0
+
+    def finish(self, last):
+        h, w = self.first.shape[:2]
+        size = (w - w % 2, h - h % 2)
+        first = self.first
+        if size != (w, h):
+            first = cv2.resize(first, size, interpolation=cv2.INTER_AREA)
+        out = open_writer(self.tmp, self.fps, size, backend=self.backend)
+        for _ in range(max(self.nframes or self.seen, int(self.fps))):
+            out.write(first)
+        out.release()
+        self._commit()
+
+
+class Pad81Sink(_Sink):
+    """First `target` frames (resized to `size`), padded with the last one. Writes as it goes."""
+
+    def __init__(self, out_path, fps, size=None, target=TARGET, backend="cv2"):
+        super().__init__(out_path)
+        self.fps = fps
+        self.size = size
+        self.target = target
+        self.backend = backend
+        self.out = None
+        self.last = None
+        self.n = 0
+
+    def feed(self, frame):
+        if self.out is None:
+            self.size = self.size or (frame.shape[1], frame.shape[0])
+            self.out = open_writer(self.tmp, self.fps, self.size, backend=self.backend)
+        if (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        self.out.write(frame)
+        self.last = frame
+        self.n += 1
+        self.done = self.n >= self.target
+
+    def finish(self, last):
+        for _ in range(self.target - self.n):
+            self.out.write(self.last)
+        self.out.release()
+        self.out = None
+        self._commit()
+
+    def abort(self):
+        if self.out is not None:
+            self.out.release()
+        super().abort()
+
+
+def output_paths(out_prefix, outputs):
+    """{name: <out_prefix><suffix>} for the selected output names."""
+    out_prefix = Path(out_prefix)
+    return {name: out_prefix.with_name(out_prefix.name + OUTPUTS[name]) for name in outputs}
+
+
+def fan_out(input, paths, fps=None, size=None, backend="cv2", quality=95):
+    """
+    Decode `input` once and write every output in `paths` ({name: path}, names from OUTPUTS).
+    - fps: output FPS of the videos (default: input FPS)
+    - size: WxH of the pad81 video (default: input size)
+    Returns a dict of stats, including how many frames were decoded.
+    """
+    unknown = set(paths) - set(OUTPUTS)
+    if unknown:
+        raise ValueError(f"Unknown outputs: {sorted(unknown)} (choose from {sorted(OUTPUTS)})")
+    for p in paths.values():
+        Path(p).parent.mkdir(parents=True, exist_ok=True)
+    sinks = []
+    if "last_frame" in paths:
+        sinks.append(LastFrameSink(paths["last_frame"], input, quality=quality))
+    if "freeze" in paths:
+        freeze_fps, nframes = _metadata_fps_and_frames(input)
+        sinks.append(FreezeSink(paths["freeze"], fps or freeze_fps, nframes, backend=backend))
+    if "pad81" in paths:
+        sinks.append(Pad81Sink(paths["pad81"], fps or video_info(input)["fps"] or 25.0, size=size,
+                               backend=backend))
+
+    cap = FrameReader(input)
+    n = 0
+    last = None
+    eof = False
+    try:
+        try:
+            while not all(s.done for s in sinks):
+                ok, frame = cap.read()
+                if not ok:
+                    eof = True
+                    break
+                last = frame
+                n += 1
+                for s in sinks:
+                    if not s.done:
+                        s.feed(frame)
+        finally:
+            cap.release()
+        if eof and n == 0:
+            raise RuntimeError("Input video has 0 readable frames.")
+        for s in sinks:
+            s.finish(last if eof else None)
+    finally:
+        for s in sinks:
+            s.abort()
+    return {"decoded": n, "outputs": {k: str(v) for k, v in paths.items()}}
+
+
+def fan_out_file(input, output, outputs, fps=None, size=None, backend="cv2", quality=95):
+    """Batch job: `output` is the path of the first selected output; the rest sit next to it."""
+    prefix = Path(output).with_name(Path(output).name[:-len(OUTPUTS[outputs[0]])])
+    return fan_out(input, output_paths(prefix, outputs), fps=fps, size=size, backend=backend, quality=quality)
+
+
+def _worker_init():
+    cv2.setNumThreads(1)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Write several per-clip outputs from a single decode.")
+    ap.add_argument("input", type=Path, help="Input video (with --batch: a directory or manifest)")
+    ap.add_argument("-o", "--output", type=Path, default=Path("."),
+                    help="Output directory; files are <stem>_last.jpg, <stem>_freeze.mp4, <stem>_81.mp4")
+    ap.add_argument("--outputs", default=",".join(OUTPUTS),
+                    help=f"Comma-separated outputs to write (default: {','.join(OUTPUTS)})")
+    ap.add_argument("--fps", type=float, default=None, help="Output FPS of the videos (default: input FPS)")
+    ap.add_argument("--size", type=parse_size, default=None, help="Size WxH of the 81-frame video")
+    ap.add_argument("--writer", choices=WRITER_BACKENDS, default="cv2",
+                    help="Encoder backend: cv2 (mp4v) or ffmpeg (libx264, browser-playable; default: cv2)")
+    ap.add_argument("--quality", type=int, default=95, help="JPEG quality 1-100 (default: 95)")
+    ap.add_argument("--batch", action="store_true", help="Process every video in a directory (or manifest)")
+    ap.add_argument("--workers", type=int, default=None, help="Batch worker processes (default: CPUs)")
+    ap.add_argument("--manifest", type=Path, default=None,
+                    help="Batch results JSONL, used to resume (default: <output dir>/results.jsonl)")
+    profiling.add_argument(ap)
+    args = ap.parse_args()
+    profiling.setup(args.profile)
+
+    outputs = [o.strip() for o in args.outputs.split(",") if o.strip()]
+    bad = [o for o in outputs if o not in OUTPUTS]
+    if bad or not outputs:
+        ap.error(f"--outputs must be a comma-separated subset of {','.join(OUTPUTS)}")
+    opts = {"fps": args.fps, "size": args.size, "backend": args.writer, "quality": args.quality}
+
+    if args.batch:
+        root, inputs = collect_inputs(args.input)
+        jobs = [{"input": str(p), "outputs": outputs, **opts,
+                 "output": str(output_path_for(p, root, args.output, suffix="")) + OUTPUTS[outputs[0]]}
+                for p in inputs]
+        counts = run_batch(fan_out_file, jobs, args.manifest or args.output / "results.jsonl",
+                           workers=args.workers, initializer=_worker_init)
+        if counts["error"]:
+            raise SystemExit(1)
+        return
+
+    stats = fan_out(args.input, output_paths(args.output / args.input.stem, outputs), **opts)
+    for name, path in stats["outputs"].items():
+        print(f"Saved {name} to {path}")
+    print(f"Decoded {stats['decoded']} frames once for {len(outputs)} outputs")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,18 +3,53 @@
 
 import cv2
 import argparse
+import os
 from pathlib import Path
 
+import numpy as np
+
+from artifact_cache import cached_output
+from batch import collect_inputs, output_path_for, run_batch, tmp_path_for
+import profiling
+from video_index import video_info
+
+def _read_final_gop(cap, keyframe, frame_count):
+    """
+    Seek to `keyframe` (the last one in the file) and decode to the end. Returns the final
+    frame, or None if the decoder did not land on `keyframe` or did not end at `frame_count`,
+    i.e. when the frame we got cannot be trusted to be the true last frame.
+    """
+    cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != keyframe:
+        return None
+    last = None
+    n = keyframe
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        last = frame
+        n += 1
+    return last if n == frame_count else None
+
 def read_last_frame(video_path):
     cap = cv2.VideoCapture(str(video_path))
     if not cap.isOpened():
         raise RuntimeError(f"Cannot open video: {video_path}")
 
-    # Try random access using frame count
-    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    # Exact frame count and keyframe positions from the video index (packet scan only: without
+    # ffprobe they are None and the container frame count drives the tail seeks below)
+    info = video_info(video_path, need_frames=True, cheap_only=True)
+    keyframes = info["keyframes"]
+    frame_count = info["frame_count"] or info["nb_frames"]
     last = None
 
-    if frame_count and frame_count > 0:
+    if keyframes and info["frame_count"]:
+        # Decode only the final GOP: cost is bounded by GOP length, not video length
+        last = _read_final_gop(cap, keyframes[-1], info["frame_count"])
+
+    if last is None and frame_count and frame_count > 0:
+        # No keyframe index (no ffprobe) or the GOP read could not be verified.
         # Some codecs require seeking to frame_count - 2 (last keyframe before final)
         # We'll try a couple positions from the end.
         for back in (1, 2, 3, 5):
@@ -42,26 +77,107 @@ def read_last_frame(video_path):
     cap.release()
     return last
 
+def read_last_frame_sequential(video_path):
+    """Reference implementation: decode every frame and keep the last (used by --verify)."""
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video: {video_path}")
+    last = None
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        last = frame
+    cap.release()
+    if last is None:
+        raise RuntimeError("Input video has 0 readable frames.")
+    return last
+
 def save_jpg(image, out_path, quality=95):
     out_path = Path(out_path)
     out_path.parent.mkdir(parents=True, exist_ok=True)
     # OpenCV expects BGR → JPEG is fine directly
-    ok = cv2.imwrite(str(out_path), image, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+    with profiling.stage("encode"):
+        ok = cv2.imwrite(str(out_path), image, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
     if not ok:
         raise RuntimeError(f"Failed to write image: {out_path}")
+    profiling.count_file("bytes_out", out_path)
+
+def save_last_frame_file(input, output, quality=95, verify=False, cache=None, cache_max=None):
+    """
+    read_last_frame + save_jpg for one video, written via temp file + rename (batch job).
+    - verify: also decode the whole video and raise RuntimeError if the frames differ
+    - cache: artifact cache directory (ignored with verify, which always decodes)
+    """
+    stats = {}
+
+    def produce(out_path):
+        with profiling.stage("decode"):
+            last_frame = read_last_frame(input)
+        if verify:
+            if not np.array_equal(last_frame, read_last_frame_sequential(input)):
+                raise RuntimeError("Verification failed: fast path did not return the true last frame.")
+            stats["verified"] = True
+        tmp = tmp_path_for(out_path)
+        try:
+            save_jpg(last_frame, tmp, quality=quality)
+            os.replace(tmp, out_path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        stats["size"] = f"{last_frame.shape[1]}x{last_frame.shape[0]}"
+
+    if cached_output(None if verify else cache, input, "last_frame", {"quality": quality}, output, produce,
+                     max_bytes=cache_max):
+        stats["cache"] = "hit"
+    return stats
+
+def _worker_init():
+    cv2.setNumThreads(1)
 
 def main():
     parser = argparse.ArgumentParser(description="Save the last frame of a video as a JPG image.")
-    parser.add_argument("input", type=Path, help="Path to input video (e.g., clip.mp4)")
-    parser.add_argument("-o", "--output", type=Path, default=Path("last_frame.jpg"),
-                        help="Output JPG path (default: last_frame.jpg)")
+    parser.add_argument("input", type=Path,
+                        help="Path to input video (e.g., clip.mp4); with --batch a directory or manifest")
+    parser.add_argument("-o", "--output", type=Path, default=None,
+                        help="Output JPG path (default: last_frame.jpg); with --batch the output "
+                             "directory (default: last_frames/)")
     parser.add_argument("--quality", type=int, default=95,
                         help="JPEG quality 1-100 (default: 95)")
+    parser.add_argument("--verify", action="store_true",
+                        help="Also decode the whole video and check the result is the true last frame")
+    parser.add_argument("--batch", action="store_true",
+                        help="Write last-frame JPGs for every video in a directory (or manifest) in parallel")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Batch worker processes (default: number of CPUs)")
+    parser.add_argument("--manifest", type=Path, default=None,
+                        help="Batch results JSONL, used to resume (default: <output dir>/results.jsonl)")
+    parser.add_argument("--cache", type=Path, default=None,
+                        help="Artifact cache directory: reuse the result of an identical earlier request")
+    parser.add_argument("--cache-max", default=None,
+                        help="Cache size limit, LRU-evicted (e.g. 20G; default: $VIDEO_CACHE_MAX or 20G)")
+    profiling.add_argument(parser)
     args = parser.parse_args()
+    profiling.setup(args.profile)
+
+    if args.batch:
+        out_dir = args.output or Path("last_frames")
+        root, inputs = collect_inputs(args.input)
+        jobs = [{"input": str(p), "output": str(output_path_for(p, root, out_dir, suffix=".jpg")),
+                 "quality": args.quality, "verify": args.verify, "cache": args.cache,
+                 "cache_max": args.cache_max} for p in inputs]
+        counts = run_batch(save_last_frame_file, jobs, args.manifest or out_dir / "results.jsonl",
+                           workers=args.workers, initializer=_worker_init)
+        if counts["error"]:
+            raise SystemExit(1)
+        return
 
-    last_frame = read_last_frame(args.input)
-    save_jpg(last_frame, args.output, quality=args.quality)
-    print(f"Saved last frame to {args.output}")
+    output = args.output or Path("last_frame.jpg")
+    stats = save_last_frame_file(args.input, output, quality=args.quality, verify=args.verify,
+                                 cache=args.cache, cache_max=args.cache_max)
+    if stats.get("verified"):
+        print("Verified against full sequential decode.")
+    print(f"Saved last frame to {output}" + (" (from cache)" if stats.get("cache") == "hit" else ""))
 
 if __name__ == "__main__":
     main()
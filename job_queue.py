@@ -0,0 +1,322 @@
+# job_queue.py
+# pip install opencv-python
+#
+# Split one dataset run across machines with nothing but a shared directory (NFS, SMB, ...).
+# `submit` turns a directory / manifest of inputs into one job file per clip; `work` runs
+# worker processes on any node that can see the directory. Jobs are claimed with atomic
+# renames, kept alive with heartbeats, and handed back to the queue when a node dies.
+#   python job_queue.py submit /shared/q resize_81 /shared/clips -o /shared/out --set size=832x480
+#   python job_queue.py work /shared/q --workers 8                 # on every node
+#   python job_queue.py status /shared/q
+#
+# Layout of the queue directory (one file per job, named by a hash of its output path):
+#   jobs/<id>.json             waiting to be claimed
+#   leases/<id>.<worker>.json  claimed; the file's mtime is the worker's last heartbeat
+#   done/<id>.json, failed/<id>.json
+#   attempts/<id>              one line per claim (a job that keeps killing workers gives up)
+#   results/<worker>.jsonl     one record per finished job, like a batch manifest
+# A claim is rename(jobs/<id>.json -> leases/<id>.<worker>.json): exactly one worker wins.
+# Any worker renames a lease whose heartbeat is older than --lease back into jobs/. Outputs
+# are written to a temp name and renamed into place before the lease is moved to done/, so
+# a dead node never leaves a half-written clip, and a job is recorded done exactly once
+# (a worker that lost its lease discards its result). Ops are those of video_worker.py.
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import socket
+import threading
+import time
+from multiprocessing import Process
+from pathlib import Path
+
+from batch import _run_job, collect_inputs, output_path_for
+import profiling
+from video_client import parse_set
+from video_worker import OPS
+
+DEFAULT_LEASE = 120.0  # seconds without a heartbeat before a job is requeued
+MAX_ATTEMPTS = 3
+STATES = ("jobs", "leases", "done", "failed")
+
+
+def job_id(output):
+    return hashlib.sha1(str(Path(output).resolve()).encode()).hexdigest()[:20]
+
+
+def _write_atomic(path, text):
+    tmp = path.with_name(f".{path.name}.{socket.gethostname()}.{os.getpid()}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+def init_queue(queue):
+    queue = Path(queue)
+    for d in (*STATES, "attempts", "results"):
+        (queue / d).mkdir(parents=True, exist_ok=True)
+    return queue
+
+
+def _known_ids(queue):
+    ids = set()
+    for d in STATES:
+        ids.update(p.name.split(".", 1)[0] for p in (queue / d).glob("*.json"))
+    return ids
+
+
+def submit(queue, op, inputs, out_dir, root=None, suffix=".mp4", opts=None):
+    """
+    Add one job per input (output mirrored below out_dir). Jobs already in the queue, in
+    any state, are left alone, so submitting the same run twice is harmless.
+    Returns (added, already queued).
+    """
+    if op not in OPS:
+        raise ValueError(f"Unknown op {op!r} (choose from {sorted(OPS)})")
+    queue = init_queue(queue)
+    known = _known_ids(queue)
+    added = 0
+    for p in inputs:
+        output = output_path_for(p, root, out_dir, suffix=suffix)
+        jid = job_id(output)
+        if jid in known:
+            continue
+        job = {"id": jid, "op": op, "input": str(p), "output": str(output), **(opts or {})}
+        _write_atomic(queue / "jobs" / f"{jid}.json", json.dumps(job))
+        known.add(jid)
+        added += 1
+    return added, len(inputs) - added
+
+
+def _fs_now(queue, worker):
+    """Current time on the shared file system's clock (lease mtimes use the same clock)."""
+    probe = queue / "results" / f".clock.{worker}"
+    probe.touch()
+    os.utime(probe)
+    return probe.stat().st_mtime
+
+
+def requeue_expired(queue, lease, worker):
+    """Move leases whose heartbeat is older than `lease` seconds back to jobs/. Returns the count."""
+    now = _fs_now(queue, worker)
+    n = 0
+    for p in (queue / "leases").glob("*.json"):
+        try:
+            if now - p.stat().st_mtime <= lease:
+                continue
+            jid, owner = p.name[:-5].split(".", 1)
+            dst = queue / "jobs" / f"{jid}.json"
+            os.utime(p)  # a fresh mtime travels with the file, so it is not requeued twice
+            os.rename(p, dst)
+        except FileNotFoundError:
+            continue  # finished, or another worker requeued it first
+        try:
+            _remove_tmp_outputs(json.loads(dst.read_text())["output"], owner)
+        except (OSError, ValueError):
+            pass  # already claimed again; the temp files are only litter
+        print(f"[queue] requeued {jid} (lease of {owner} expired)")
+        n += 1
+    return n
+
+
+def claim(queue, worker):
+    """Claim one waiting job; returns (job, lease path) or None if nothing is waiting."""
+    names = sorted(p.name for p in (queue / "jobs").glob("*.json"))
+    if not names:
+        return None
+    start = random.randrange(len(names))  # spread concurrent workers over the list
+    for name in names[start:] + names[:start]:
+        src = queue / "jobs" / name
+        lease = queue / "leases" / f"{name[:-5]}.{worker}.json"
+        try:
+            os.utime(src)  # so the lease starts out fresh
+            os.rename(src, lease)
+        except FileNotFoundError:
+            continue  # another worker got it
+        os.utime(lease)
+        return json.loads(lease.read_text()), lease
+    return None
+
+
+class Heartbeat(threading.Thread):
+    """Touches the lease file every `interval` s; sets `lost` if it has been taken away."""
+
+    def __init__(self, lease, interval):
+        super().__init__(daemon=True)
+        self.lease = lease
+        self.interval = interval
+        self.lost = False
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            try:
+                os.utime(self.lease)
+            except FileNotFoundError:
+                self.lost = True
+                return
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+def _tmp_output(output, worker):
+    # worker (host-pid) keeps temp names unique across nodes sharing the directory
+    output = Path(output)
+    return output.with_name(f".{output.stem}.{worker}.tmp{output.suffix}")
+
+
+def _remove_tmp_outputs(output, worker):
+    """Delete a dead worker's temp output and the temp files the op made from its name."""
+    tmp = _tmp_output(output, worker)
+    for p in tmp.parent.glob(f".{tmp.stem}*"):  # the op's own temp is ".<tmp stem>.<pid>.tmp<suffix>"
+        p.unlink(missing_ok=True)
+    tmp.unlink(missing_ok=True)
+
+
+def run_one(queue, job, lease, worker, lease_s=DEFAULT_LEASE, max_attempts=MAX_ATTEMPTS):
+    """Run a claimed job, commit its output and move the lease to done/ or failed/."""
+    jid = job["id"]
+    with open(queue / "attempts" / jid, "a") as f:
+        f.write(f"{worker} {time.time():.0f}\n")
+    attempts = len((queue / "attempts" / jid).read_text().splitlines())
+
+    output = Path(job["output"])
+    tmp = _tmp_output(output, worker)
+    params = {k: v for k, v in job.items() if k not in ("id", "op")}
+    if attempts > max_attempts:
+        rec = {"input": job["input"], "output": str(output), "status": "error",
+               "error": f"gave up after {max_attempts} attempts (worker died each time)"}
+    else:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        hb = Heartbeat(lease, lease_s / 4)
+        hb.start()
+        try:
+            rec = _run_job(OPS[job["op"]], {**params, "output": str(tmp)}, profiling.enabled())
+        finally:
+            hb.stop()
+        rec["output"] = str(output)
+        if hb.lost:
+            if tmp.exists():
+                tmp.unlink()
+            print(f"[queue] lost the lease on {jid} while running it; result discarded")
+            return None
+        if rec["status"] == "ok" and tmp.exists():
+            os.replace(tmp, output)
+        elif tmp.exists():
+            tmp.unlink()
+
+    state = "done" if rec["status"] == "ok" else "failed"
+    try:
+        os.rename(lease, queue / state / f"{jid}.json")
+    except FileNotFoundError:
+        print(f"[queue] lease on {jid} expired before it finished; left to the new owner")
+        return None
+    rec.update(id=jid, op=job["op"], worker=worker, attempts=attempts)
+    with open(queue / "results" / f"{worker}.jsonl", "a") as f:
+        f.write(json.dumps(rec) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    return rec
+
+
+def work(queue, lease_s=DEFAULT_LEASE, max_attempts=MAX_ATTEMPTS, poll=2.0, follow=False, profile=None):
+    """
+    Worker loop: requeue expired leases, claim, run, repeat. Returns when nothing is waiting
+    or leased (with follow, keeps polling for new jobs instead). Returns {"ok": .., "error": ..}.
+    With `profile` (a path), each job's profiling summary is appended to it as one JSON line
+    (and attached to its results record).
+    """
+    if profile:
+        profiling.enable()
+    try:
+        import cv2
+        cv2.setNumThreads(1)  # one clip per worker process already keeps the cores busy
+    except ImportError:
+        pass
+    queue = init_queue(queue)
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    counts = {"ok": 0, "error": 0}
+    while True:
+        requeue_expired(queue, lease_s, worker)
+        got = claim(queue, worker)
+        if got is None:
+            if not follow and not any((queue / "leases").glob("*.json")):
+                print(f"[queue] {worker} finished: {counts}")
+                return counts
+            time.sleep(poll)  # others are still running; their jobs may come back
+            continue
+        rec = run_one(queue, *got, worker, lease_s=lease_s, max_attempts=max_attempts)
+        if rec is not None and profile:
+            profiling.write(profile)
+        if rec is not None:
+            counts[rec["status"]] += 1
+            if rec["status"] != "ok":
+                print(f"[queue] {worker} error: {rec['input']} ({rec['error']})")
+
+
+def status(queue):
+    queue = Path(queue)
+    return {d: sum(1 for _ in (queue / d).glob("*.json")) for d in STATES}
+
+
+def _errors(queue):
+    for p in sorted((Path(queue) / "results").glob("*.jsonl")):
+        for line in p.read_text().splitlines():
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from a crash
+            if rec.get("status") != "ok":
+                yield rec
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Shared-directory job queue for multi-node batch runs.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    s = sub.add_parser("submit", help="Add one job per input video")
+    s.add_argument("queue", type=Path, help="Queue directory (shared by every node)")
+    s.add_argument("op", choices=sorted(OPS), help="Operation to run on each input")
+    s.add_argument("input", type=Path, help="Directory of videos or manifest of paths")
+    s.add_argument("-o", "--output", type=Path, required=True, help="Output directory (input layout is mirrored)")
+    s.add_argument("--suffix", default=None, help="Output extension (default: .jpg for last_frame, else .mp4)")
+    s.add_argument("--set", dest="opts", type=parse_set, action="append", default=[], metavar="KEY=VALUE",
+                   help="Option for the op, e.g. --set size=832x480 (repeatable)")
+    w = sub.add_parser("work", help="Process jobs until the queue is drained")
+    w.add_argument("queue", type=Path, help="Queue directory")
+    w.add_argument("--workers", type=int, default=None, help="Worker processes on this node (default: CPUs)")
+    w.add_argument("--lease", type=float, default=DEFAULT_LEASE,
+                   help=f"Seconds without a heartbeat before a job is requeued (default: {DEFAULT_LEASE:g})")
+    w.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS,
+                   help=f"Claims per job before it is marked failed (default: {MAX_ATTEMPTS})")
+    w.add_argument("--follow", action="store_true", help="Keep waiting for new jobs instead of exiting")
+    profiling.add_argument(w)
+    st = sub.add_parser("status", help="Count jobs per state and list failures")
+    st.add_argument("queue", type=Path, help="Queue directory")
+    args = ap.parse_args()
+
+    if args.command == "submit":
+        root, inputs = collect_inputs(args.input)
+        suffix = args.suffix or (".jpg" if args.op == "last_frame" else ".mp4")
+        added, known = submit(args.queue, args.op, inputs, args.output, root=root, suffix=suffix,
+                              opts=dict(args.opts))
+        print(f"[queue] added {added} jobs ({known} already queued) to {args.queue}")
+    elif args.command == "work":
+        procs = [Process(target=work, args=(args.queue, args.lease, args.max_attempts),
+                         kwargs={"follow": args.follow, "profile": args.profile})
+                 for _ in range(args.workers or os.cpu_count() or 1)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        print(f"[queue] {status(args.queue)}")
+    else:
+        print(json.dumps(status(args.queue)))
+        for rec in _errors(args.queue):
+            print(f"failed: {rec['input']} ({rec['error']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,38 @@
 import cv2
 import os
+import subprocess
+import tempfile
 from pathlib import Path
 
-def _infer_fps_and_frames(cap):
-    """Try to get FPS and frame count from container; if missing, fall back to manual count."""
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    nframes = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-    # Some containers don’t report these reliably; patch up if needed.
-    if not fps or fps <= 1e-3:
-        fps = 30.0  # safe default
-
-    if not nframes or nframes <= 0:
-        # Fallback: count by scanning once (costly for long videos, but robust)
-        pos = cap.get(cv2.CAP_PROP_POS_FRAMES)
-        count = 1  # we already read frame 0 outside
-        while True:
-            ok, _ = cap.read()
-            if not ok:
-                break
-            count += 1
-        # Reset to the beginning for consistency
-        cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
-        nframes = count
+from artifact_cache import cached_output
+import profiling
+from video_index import video_info
+from video_io import WRITER_BACKENDS, AsyncWriter, FFmpegWriter
+
+def _metadata_fps_and_frames(path):
+    """
+    FPS and frame count without decoding: the container's frame count, else duration * fps,
+    from the stream headers in the video index. Only a container with neither makes the
+    index count the frames (a scan of the whole file, cached).
+    """
+    info = video_info(path)
+    fps = info["fps"] or 30.0  # safe default
+    nframes = info["frame_count"] or info["nb_frames"]
+    if not nframes and info["duration"]:
+        nframes = int(round(info["duration"] * fps))
+    if not nframes:
+        nframes = video_info(path, need_frames=True)["frame_count"]
     return float(fps), int(nframes)
 
+def _run_ffmpeg(cmd):
+    try:
+        with profiling.stage("ffmpeg"):
+            proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg not found on PATH (needed for the fast freeze path).")
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {proc.stderr.strip()}")
+
 def _choose_fourcc(output_path):
     """
     Choose a reasonable FourCC based on extension.
@@ -38,21 +46,26 @@ def _choose_fourcc(output_path):
     # Default to mp4v for .mp4 and everything else
     return cv2.VideoWriter_fourcc(*"mp4v")
 
-def freeze_first_frame_cv(in_path, out_path=None, target_fps=None, verbose=True):
+def default_output_path(in_path, fast=False):
+    """<stem>_freeze.<ext>: keep the input extension if common, else .mp4 (no .avi for the H.264 fast path)."""
+    exts = (".mp4", ".mov", ".mkv") if fast else (".mp4", ".avi", ".mov", ".mkv")
+    ext = in_path.suffix.lower()
+    if ext not in exts:
+        ext = ".mp4"
+    return in_path.with_name(in_path.stem + "_freeze" + ext)
+
+def freeze_first_frame_cv(in_path, out_path=None, target_fps=None, verbose=True, backend="cv2"):
     """
     Create a video where every frame is the first frame of the input.
     - in_path: input video path
     - out_path: output video path (default: <stem>_freeze.<ext or .mp4>)
     - target_fps: override FPS (float). If None, try to keep original FPS (or 30 fallback).
+    - backend: "cv2" (FourCC from extension) or "ffmpeg" (libx264 pipe, browser-playable)
     Returns the output path.
     """
     in_path = Path(in_path)
     if out_path is None:
-        # Keep same extension if common; else default to .mp4
-        ext = in_path.suffix.lower()
-        if ext not in (".mp4", ".avi", ".mov", ".mkv"):
-            ext = ".mp4"
-        out_path = in_path.with_name(in_path.stem + "_freeze" + ext)
+        out_path = default_output_path(in_path)
     else:
         out_path = Path(out_path)
 
@@ -74,17 +87,25 @@ def freeze_first_frame_cv(in_path, out_path=None, target_fps=None, verbose=True)
         first = cv2.resize(first, (w, h), interpolation=cv2.INTER_AREA)
 
     # FPS & total frames
-    fps_orig, nframes = _infer_fps_and_frames(cap)
+    fps_orig, nframes = _metadata_fps_and_frames(in_path)
     fps = float(target_fps) if target_fps else fps_orig
     if fps <= 1e-3:
         fps = 30.0
 
     # Writer
-    fourcc = _choose_fourcc(out_path)
-    writer = cv2.VideoWriter(str(out_path), fourcc, fps, (w, h))
-    if not writer.isOpened():
-        cap.release()
-        raise RuntimeError("Could not open VideoWriter. Try changing extension or FourCC.")
+    if backend == "ffmpeg":
+        try:
+            writer = FFmpegWriter(out_path, fps, (w, h))
+        except RuntimeError:
+            cap.release()
+            raise
+    else:
+        fourcc = _choose_fourcc(out_path)
+        writer = cv2.VideoWriter(str(out_path), fourcc, fps, (w, h))
+        if not writer.isOpened():
+            cap.release()
+            raise RuntimeError("Could not open VideoWriter. Try changing extension or FourCC.")
+    writer = AsyncWriter(writer, out_path=out_path)
 
     # Write the same frame nframes times (or at least 1 second if nframes unknown)
     frames_to_write = max(nframes, int(fps))  # guarantees at least ~1s if container lacked count
@@ -99,14 +120,107 @@ def freeze_first_frame_cv(in_path, out_path=None, target_fps=None, verbose=True)
     cap.release()
     return str(out_path)
 
+def freeze_first_frame_fast(in_path, out_path=None, target_fps=None, verbose=True):
+    """
+    Same output as freeze_first_frame_cv, but with near-constant runtime for any length:
+    - only the first frame is decoded; fps / frame count come from container metadata
+    - the still is encoded once, as a single short H.264 GOP (one I-frame + skip P-frames)
+    - ffmpeg loops that GOP with stream copy (-stream_loop, -c copy) up to the frame count,
+      so the long output is assembled at the container level without re-encoding
+    Returns the output path.
+    """
+    in_path = Path(in_path)
+    if out_path is None:
+        out_path = default_output_path(in_path, fast=True)
+    else:
+        out_path = Path(out_path)
+
+    cap = cv2.VideoCapture(str(in_path))
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video: {in_path}")
+    ok, first = cap.read()
+    if not ok or first is None:
+        cap.release()
+        raise RuntimeError("Could not read the first frame.")
+
+    h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or first.shape[0]
+    w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or first.shape[1]
+    w -= (w % 2)
+    h -= (h % 2)
+    if (w, h) != (first.shape[1], first.shape[0]):
+        first = cv2.resize(first, (w, h), interpolation=cv2.INTER_AREA)
+
+    cap.release()
+    fps_orig, nframes = _metadata_fps_and_frames(in_path)
+    fps = float(target_fps) if target_fps else fps_orig
+    if fps <= 1e-3:
+        fps = 30.0
+
+    frames_to_write = max(nframes, int(fps))
+    gop = max(1, min(frames_to_write, int(round(fps))))  # ~1s segment, looped below
+    if verbose:
+        print(f"[freeze_first_frame_fast] Writing {frames_to_write} frames at {fps:.3f} FPS, size {w}x{h} "
+              f"(1 encoded GOP of {gop} frames, looped)")
+        print(f"[freeze_first_frame_fast] Output: {out_path}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        still = os.path.join(tmp, "still.png")
+        seg = os.path.join(tmp, "seg.mp4")
+        if not cv2.imwrite(still, first):
+            raise RuntimeError("Could not write the still image.")
+        # Encode the still once: one I-frame followed by (nearly free) identical P-frames.
+        # No B-frames, so the looped stream can be cut after any packet.
+        _run_ffmpeg([
+            "ffmpeg", "-y", "-v", "error",
+            "-loop", "1", "-framerate", f"{fps}", "-i", still,
+            "-frames:v", str(gop),
+            "-c:v", "libx264", "-tune", "stillimage", "-preset", "veryfast", "-crf", "18",
+            "-g", str(gop), "-bf", "0", "-pix_fmt", "yuv420p",
+            seg,
+        ])
+        # Duplicate at the container level: loop the encoded GOP, no re-encode.
+        _run_ffmpeg([
+            "ffmpeg", "-y", "-v", "error",
+            "-stream_loop", "-1", "-i", seg,
+            "-c", "copy", "-frames:v", str(frames_to_write),
+            "-movflags", "+faststart",
+            str(out_path),
+        ])
+    return str(out_path)
+
 # python make_freeze_vid.py --input ... --output ...
 
 if __name__ == "__main__":
     import argparse
-    ap = argparse.ArgumentParser(description="Freeze entire video to its first frame (OpenCV-only).")
+    ap = argparse.ArgumentParser(description="Freeze entire video to its first frame (OpenCV; --fast uses ffmpeg).")
     ap.add_argument("input", help="Input video path")
     ap.add_argument("-o", "--output", help="Output path (default: <input>_freeze.mp4)")
     ap.add_argument("--fps", type=float, default=None, help="Override output FPS (default: keep/or 30)")
+    ap.add_argument("--writer", choices=WRITER_BACKENDS, default="cv2",
+                    help="Encoder backend: cv2 (mp4v/MJPG) or ffmpeg (libx264, browser-playable; default: cv2)")
+    ap.add_argument("--fast", action="store_true",
+                    help="Encode the still once and loop it with ffmpeg stream copy "
+                         "(runtime ~constant in output length; needs ffmpeg)")
+    ap.add_argument("--cache", default=None,
+                    help="Artifact cache directory: reuse the result of an identical earlier request")
+    ap.add_argument("--cache-max", default=None,
+                    help="Cache size limit, LRU-evicted (e.g. 20G; default: $VIDEO_CACHE_MAX or 20G)")
+    profiling.add_argument(ap)
     args = ap.parse_args()
-
-    freeze_first_frame_cv(args.input, args.output, args.fps)
+    profiling.setup(args.profile)
+
+    def produce(out_path):
+        # With --cache, out_path is the cache's temp object; the real output is printed below.
+        verbose = args.cache is None
+        if args.fast:
+            freeze_first_frame_fast(args.input, out_path, args.fps, verbose=verbose)
+        else:
+            freeze_first_frame_cv(args.input, out_path, args.fps, verbose=verbose, backend=args.writer)
+
+    output = args.output or default_output_path(Path(args.input), fast=args.fast)
+    params = {"fps": args.fps, "fast": args.fast, "backend": "ffmpeg" if args.fast else args.writer}
+    if cached_output(args.cache, args.input, "freeze_first_frame_cv", params, output, produce,
+                     max_bytes=args.cache_max):
+        print(f"[freeze_first_frame_cv] Output (from cache): {output}")
+    elif args.cache is not None:
+        print(f"[freeze_first_frame_cv] Output: {output}")
@@ -0,0 +1,201 @@
+# pipeline.py
+# pip install opencv-python
+#
+# One-pass clip preparation: download -> trim -> resize -> pad-to-81 -> playable MP4.
+# The chained scripts (download_video.py, trim_frame.py, resize_video_81.py /
+# append_last_frame.py, viewable.py) each decode and re-encode; here they are stages over a
+# single frame stream, so every clip is decoded once and encoded once (ffmpeg writer:
+# H.264 yuv420p +faststart, i.e. already web-playable). A URL source is fetched with a
+# stream-copy section download, which does not re-encode.
+#
+# Config (JSON):
+#   {
+#     "source": {"url": "https://...", "start": 2, "end": 7},   # or {"path": "in.mp4"}
+#     "stages": [
+#       {"op": "trim", "start_frame": 0, "end_frame": 80},
+#       {"op": "resize", "size": "832x480"},
+#       {"op": "pad", "target": 81, "truncate": true}
+#     ],
+#     "output": {"path": "clip_81.mp4", "fps": 16, "writer": "ffmpeg"}
+#   }
+#   python pipeline.py config.json                      # source/output from the config
+#   python pipeline.py config.json in.mp4 -o out.mp4    # same stages, other files
+#   python pipeline.py config.json clips/ --batch -o out/
+
+import argparse
+import itertools
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import cv2
+
+from batch import collect_inputs, output_path_for, run_batch, tmp_path_for
+import profiling
+from video_index import video_info
+from video_io import FrameReader, open_writer
+
+STAGES = {}
+
+
+def stage(name):
+    """Register a frame-stream stage: fn(frames, **params) -> frames."""
+    def register(fn):
+        STAGES[name] = fn
+        return fn
+    return register
+
+
+@stage("trim")
+def trim_frames(frames, start_frame=0, end_frame=None):
+    """Keep frames start_frame..end_frame (inclusive; None = to the end)."""
+    stop = None if end_frame is None else end_frame + 1
+    return itertools.islice(frames, start_frame, stop)
+
+
+@stage("resize")
+def resize_frames(frames, size):
+    """Resize every frame to size ("WxH" or [w, h])."""
+    if isinstance(size, str):
+        size = [int(v) for v in size.lower().split("x")]
+    size = tuple(size)
+    for f in frames:
+        if (f.shape[1], f.shape[0]) != size:
+            with profiling.stage("resize"):
+                f = cv2.resize(f, size, interpolation=cv2.INTER_AREA)
+        yield f
+
+
+@stage("pad")
+def pad_frames(frames, target=81, truncate=True):
+    """Repeat the last frame up to `target` frames; with truncate, stop at `target`."""
+    n = 0
+    last = None
+    for f in frames:
+        if truncate and n >= target:
+            return
+        yield f
+        last = f
+        n += 1
+    if last is None:
+        raise RuntimeError("Input video has 0 frames.")
+    for _ in range(target - n):
+        yield last
+
+
+def load_config(path):
+    with open(path) as f:
+        cfg = json.load(f)
+    for st in cfg.get("stages", []):
+        if st.get("op") not in STAGES:
+            raise ValueError(f"Unknown stage op: {st.get('op')} (choose from {sorted(STAGES)})")
+    return cfg
+
+
+def _resolve_source(source, tmp):
+    """Local path for the source; URLs are section-downloaded (stream copy) into tmp."""
+    if "path" in source:
+        return source["path"]
+    from download_video import download_section  # yt_dlp is only needed for URL sources
+    return download_section(source["url"], tmp, source.get("start", 0), source.get("end", float("inf")),
+                            name="source", exact_cuts=source.get("exact_cuts", False))
+
+
+def run_pipeline(config, input=None, output=None):
+    """
+    Run the configured stages over one decode of the source and one encode of the result.
+    `input` / `output` override config["source"] / config["output"]["path"].
+    Returns a dict of stats.
+    """
+    source = {"path": str(input)} if input is not None else config["source"]
+    out_cfg = config.get("output", {})
+    output = Path(output or out_cfg["path"])
+    stages = [dict(st) for st in config.get("stages", [])]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = _resolve_source(source, tmp)
+        cap = cv2.VideoCapture(str(src))
+        if not cap.isOpened():
+            raise RuntimeError(f"Cannot open video: {src}")
+        fps = out_cfg.get("fps") or video_info(src)["fps"] or 25.0
+
+        # A leading trim seeks instead of decoding the frames it would drop.
+        if stages and stages[0]["op"] == "trim" and stages[0].get("start_frame", 0) > 0:
+            start = stages[0]["start_frame"]
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            stages[0]["start_frame"] = 0
+            if stages[0].get("end_frame") is not None:
+                stages[0]["end_frame"] -= start
+
+        reader = FrameReader(cap)
+        frames = iter(reader)
+        for st in stages:
+            params = {k: v for k, v in st.items() if k != "op"}
+            frames = STAGES[st["op"]](frames, **params)
+
+        output.parent.mkdir(parents=True, exist_ok=True)
+        tmp_out = tmp_path_for(output)
+        out = None
+        n = 0
+        try:
+            for f in frames:
+                if out is None:
+                    out = open_writer(tmp_out, fps, (f.shape[1], f.shape[0]),
+                                      backend=out_cfg.get("writer", "ffmpeg"))
+                out.write(f)
+                n += 1
+            if out is None:
+                raise RuntimeError("Pipeline produced no frames.")
+            out.release()
+            out = None
+            os.replace(tmp_out, output)
+        finally:
+            reader.release()
+            if out is not None:
+                out.release()
+            if tmp_out.exists():
+                tmp_out.unlink()
+    return {"frames": n, "fps": fps, "size": f"{f.shape[1]}x{f.shape[0]}"}
+
+
+def run_pipeline_file(input, output, config):
+    """Batch job wrapper (module-level so it can be pickled)."""
+    return run_pipeline(config, input=input, output=output)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run a declarative single-decode/single-encode clip pipeline.")
+    ap.add_argument("config", type=Path, help="Pipeline config (JSON)")
+    ap.add_argument("input", type=Path, nargs="?", default=None,
+                    help="Input video (default: config source); with --batch a directory or manifest")
+    ap.add_argument("-o", "--output", type=Path, default=None,
+                    help="Output path (default: config output.path); with --batch the output directory")
+    ap.add_argument("--batch", action="store_true", help="Run the pipeline over many inputs in parallel")
+    ap.add_argument("--workers", type=int, default=None, help="Batch worker processes (default: CPUs)")
+    ap.add_argument("--manifest", type=Path, default=None,
+                    help="Batch results JSONL, used to resume (default: <output dir>/results.jsonl)")
+    profiling.add_argument(ap)
+    args = ap.parse_args()
+    profiling.setup(args.profile)
+
+    cfg = load_config(args.config)
+    if args.batch:
+        if args.input is None or args.output is None:
+            ap.error("--batch needs an input directory/manifest and -o output directory")
+        root, inputs = collect_inputs(args.input)
+        jobs = [{"input": str(p), "output": str(output_path_for(p, root, args.output)), "config": cfg}
+                for p in inputs]
+        counts = run_batch(run_pipeline_file, jobs, args.manifest or args.output / "results.jsonl",
+                           workers=args.workers)
+        if counts["error"]:
+            raise SystemExit(1)
+        return
+
+    stats = run_pipeline(cfg, input=args.input, output=args.output)
+    print(f"Saved {stats['frames']} frames to {args.output or cfg['output']['path']}  "
+          f"({stats['size']} @ {stats['fps']:.2f} fps, 1 decode + 1 encode)")
+
+
+if __name__ == "__main__":
+    main()
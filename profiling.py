@@ -0,0 +1,133 @@
+# profiling.py
+#
+# Opt-in instrumentation shared by the scripts: wall time per stage (decode, resize,
+# encode, ffmpeg, download, ...), counters (frames, bytes in/out) and peak RSS.
+# Every script takes --profile PATH and appends one JSON line per run to PATH, so many
+# jobs can share a file and be aggregated later; batch runs also attach each job's numbers
+# to its manifest record.
+#   python resize_video_81.py in.mp4 --profile prof.jsonl
+#   {"script": "resize_video_81.py", "wall_s": 1.93, "peak_rss_mb": 212.4,
+#    "stages": {"decode": {"s": 0.81, "calls": 82}, ...}, "counters": {"frames_decoded": 81, ...}}
+#
+# Off by default: stage() then returns a shared no-op context manager and count() returns
+# at once, so the hooks in per-frame loops cost a function call and a global lookup.
+# Stages timed on the reader/writer threads overlap, so their sum can exceed wall_s.
+
+import atexit
+import contextlib
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+_NOOP = contextlib.nullcontext()
+_lock = threading.Lock()
+_state = None  # {"t0", "stages", "counters"} while profiling is on
+
+
+def enabled():
+    return _state is not None
+
+
+def enable():
+    """Turn profiling on (and start a fresh set of numbers)."""
+    global _state
+    _state = {"t0": time.perf_counter(), "stages": {}, "counters": {}}
+
+
+def disable():
+    global _state
+    _state = None
+
+
+class _Stage:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        dt = time.perf_counter() - self.t0
+        st = _state
+        if st is not None:
+            with _lock:
+                rec = st["stages"].setdefault(self.name, [0.0, 0])
+                rec[0] += dt
+                rec[1] += 1
+        return False
+
+
+def stage(name):
+    """Time a block: `with stage("decode"): ...` (no-op unless profiling is on)."""
+    if _state is None:
+        return _NOOP
+    return _Stage(name)
+
+
+def count(name, n=1):
+    """Add n to counter `name` (no-op unless profiling is on)."""
+    st = _state
+    if st is None:
+        return
+    with _lock:
+        st["counters"][name] = st["counters"].get(name, 0) + n
+
+
+def count_file(name, path):
+    """Add the size of the file at `path` to counter `name` (bytes_in / bytes_out)."""
+    if _state is None:
+        return
+    try:
+        count(name, os.path.getsize(path))
+    except OSError:
+        pass
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak resident set size in MB (RUSAGE_CHILDREN: largest finished child, e.g. ffmpeg)."""
+    rss = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def snapshot():
+    """Numbers collected since enable(), as a JSON-ready dict."""
+    st = _state
+    with _lock:
+        stages = {k: {"s": round(v[0], 4), "calls": v[1]} for k, v in st["stages"].items()}
+        counters = dict(st["counters"])
+    return {
+        "wall_s": round(time.perf_counter() - st["t0"], 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "peak_rss_children_mb": round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+        "stages": stages,
+        "counters": counters,
+    }
+
+
+def write(path):
+    """Append this run's summary to `path` as one JSON line."""
+    rec = {"script": os.path.basename(sys.argv[0]), "argv": sys.argv[1:], "pid": os.getpid(),
+           "time": round(time.time(), 3), **snapshot()}
+    with open(path, "a") as f:
+        f.write(json.dumps(rec) + "\n")
+
+
+def add_argument(parser):
+    parser.add_argument("--profile", default=None, metavar="PATH",
+                        help="Append per-stage timings, frame/byte counters and peak RSS for this "
+                             "run to PATH as one JSON line")
+
+
+def setup(path):
+    """Profile this run and write the summary to `path` at exit (nothing happens for None)."""
+    if path is None:
+        return
+    enable()
+    atexit.register(write, path)
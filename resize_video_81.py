@@ -3,20 +3,32 @@
 
 import cv2
 import argparse
+import bisect
+import os
 from pathlib import Path
 
+from artifact_cache import cached_output
+from batch import collect_inputs, output_path_for, run_batch, tmp_path_for
+import profiling
+from video_index import video_info
+from video_io import WRITER_BACKENDS, FrameReader, open_writer
+
 TARGET = 81
+SAMPLE_MODES = ("first", "uniform", "fps")
+OUTPUT_FORMATS = ("mp4", "npy")  # npy: memory-mappable T x H x W x 3 array (clip_array.py)
+SEEK_GAP = 250  # without a keyframe index, seek instead of grab() across larger gaps
 
 def open_video(path: Path):
     cap = cv2.VideoCapture(str(path))
     if not cap.isOpened():
         raise RuntimeError(f"Cannot open video: {path}")
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    if not fps or fps <= 1e-3:
-        fps = 25.0  # sensible default if metadata missing
-    w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or None
-    h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or None
-    return cap, fps, (w, h)
+    profiling.count_file("bytes_in", path)
+    info = video_info(path)
+    fps = info["fps"] or 25.0  # sensible default if metadata missing
+    w = info["width"] or None
+    h = info["height"] or None
+    # Decode ahead on a background thread; still usable via cap.read()
+    return FrameReader(cap), fps, (w, h)
 
 def parse_size(size_str: str):
     try:
@@ -25,7 +37,7 @@ def parse_size(size_str: str):
     except Exception:
         raise argparse.ArgumentTypeError("Size must be like 1920x1080")
 
-def write_video(frames, out_path: Path, fps: float, size=None):
+def write_video(frames, out_path: Path, fps: float, size=None, backend: str = "cv2", meta=None):
     if not frames:
         raise RuntimeError("No frames to write.")
     h, w = frames[0].shape[:2]
@@ -33,14 +45,12 @@ def write_video(frames, out_path: Path, fps: float, size=None):
         out_size = (w, h)
     else:
         out_size = size
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    out = cv2.VideoWriter(str(out_path), fourcc, fps, out_size)
-    if not out.isOpened():
-        raise RuntimeError(f"Cannot open output for writing: {out_path}")
+    out = open_writer(out_path, fps, out_size, backend=backend, meta=meta)
 
     for f in frames:
         if out_size != (f.shape[1], f.shape[0]):
-            f = cv2.resize(f, out_size, interpolation=cv2.INTER_AREA)
+            with profiling.stage("resize"):
+                f = cv2.resize(f, out_size, interpolation=cv2.INTER_AREA)
         out.write(f)
     out.release()
 
@@ -63,28 +73,195 @@ def make_81_frames(cap, target=TARGET):
     frames.extend([last] * (target - len(frames)))
     return frames
 
+def uniform_indices(frame_count, n=TARGET):
+    """n frame numbers spread evenly from the first to the last frame (repeats if frame_count < n)."""
+    if frame_count <= 0:
+        raise RuntimeError("Input video has 0 readable frames.")
+    if n == 1:
+        return [0]
+    return [round(i * (frame_count - 1) / (n - 1)) for i in range(n)]
+
+def fps_indices(frame_count, src_fps, target_fps, n=TARGET):
+    """Frame numbers nearest to t = 0, 1/target_fps, 2/target_fps, ... (at most n, inside the video)."""
+    idx = []
+    for i in range(n):
+        k = int(round(i * src_fps / target_fps))
+        if k >= frame_count:
+            break
+        idx.append(k)
+    return idx
+
+def _should_seek(pos, idx, keyframes, seek_gap):
+    if keyframes:
+        # Seeking decodes from the last keyframe <= idx; worth it if that is past our position
+        k = keyframes[bisect.bisect_right(keyframes, idx) - 1]
+        return k > pos
+    return idx - pos > seek_gap
+
+def read_frames_at(path, indices, keyframes=None, seek_gap=SEEK_GAP):
+    """
+    Decode only the frames at `indices` (ascending, repeats allowed).
+    Frames in between are skipped with cap.grab() (no retrieve, colour conversion or copy);
+    when a keyframe lies between the current position and the next wanted frame (or, with no
+    keyframe index, the gap is larger than seek_gap) the capture seeks instead.
+    Returns the frames found, in `indices` order (shorter if the video ends early).
+    """
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video: {path}")
+    got = {}
+    pos = 0  # number of the next frame grab() would return
+    try:
+        for idx in sorted(set(indices)):
+            if idx > pos and _should_seek(pos, idx, keyframes, seek_gap):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+                pos = idx
+            while pos < idx and cap.grab():
+                pos += 1
+            if pos < idx or not cap.grab():
+                break
+            pos += 1
+            ok, frame = cap.retrieve()
+            if not ok:
+                break
+            got[idx] = frame
+    finally:
+        cap.release()
+    return [got[i] for i in indices if i in got]
+
+def resample_81_frames(path, mode="uniform", target=TARGET, target_fps=None):
+    """
+    Pick `target` frames spread over the whole video instead of the first `target`:
+    - "uniform": evenly spaced from first to last frame
+    - "fps": one frame every 1/target_fps seconds from the start (padded with the last
+      frame if the video is too short)
+    Returns (frames, in_fps, (w, h)).
+    """
+    info = video_info(path, need_frames=True)
+    in_fps = info["fps"] or 25.0
+    if mode == "uniform":
+        indices = uniform_indices(info["frame_count"], target)
+    elif mode == "fps":
+        if not target_fps or target_fps <= 0:
+            raise ValueError("sample mode 'fps' needs target_fps > 0")
+        indices = fps_indices(info["frame_count"], in_fps, target_fps, target)
+    else:
+        raise ValueError(f"Unknown sample mode: {mode} (choose from {SAMPLE_MODES})")
+    frames = read_frames_at(path, indices, keyframes=info["keyframes"])
+    if not frames:
+        raise RuntimeError("Input video has 0 readable frames.")
+    frames.extend([frames[-1]] * (target - len(frames)))
+    return frames, in_fps, (info["width"] or None, info["height"] or None)
+
+def resize_81_file(input, output, fps=None, size=None, backend="cv2", cache=None, cache_max=None,
+                   sample="first", target_fps=None):
+    """
+    make_81_frames (or resample_81_frames for sample="uniform"/"fps") + write_video for one
+    file. The output is written to a temp name and renamed into place, so a crash never
+    leaves a half-written file behind.
+    With `cache` (a directory), an identical earlier request is copied from the artifact cache.
+    Returns a small dict of stats (used by the batch manifest).
+    """
+    stats = {"frames": TARGET}
+    params = {"target": TARGET, "fps": fps, "size": size, "backend": backend}
+    if sample != "first":
+        params.update(sample=sample, target_fps=target_fps)
+    produce = lambda path: stats.update(_resize_81(input, path, fps, size, backend, sample, target_fps))
+    if cached_output(cache, input, "make_81_frames", params, output, produce, max_bytes=cache_max):
+        stats["cache"] = "hit"
+    return stats
+
+def _resize_81(input, output, fps, size, backend, sample="first", target_fps=None):
+    if sample == "first":
+        cap, in_fps, in_size = open_video(Path(input))
+        try:
+            frames = make_81_frames(cap, target=TARGET)
+        finally:
+            cap.release()
+    else:
+        frames, in_fps, in_size = resample_81_frames(input, sample, TARGET, target_fps)
+        if sample == "fps":
+            in_fps = target_fps  # frames are target_fps apart
+    out_fps = fps if (fps and fps > 0) else in_fps
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = tmp_path_for(output)
+    try:
+        write_video(frames, tmp, out_fps, size=size, backend=backend,
+                    meta={"source": str(input), "sample": sample})
+        os.replace(tmp, output)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    out_size = size or in_size
+    return {"frames": len(frames), "fps": out_fps, "size": f"{out_size[0]}x{out_size[1]}"}
+
+def _worker_init():
+    # One clip per process already keeps the cores busy; avoid thread oversubscription.
+    cv2.setNumThreads(1)
+
 def main():
     ap = argparse.ArgumentParser(
         description="Force any video to exactly 81 frames (truncate or pad with last frame)."
     )
-    ap.add_argument("input", type=Path, help="Input video path")
-    ap.add_argument("-o", "--output", type=Path, default=Path("video_81.mp4"),
-                    help="Output video path (default: video_81.mp4)")
+    ap.add_argument("input", type=Path,
+                    help="Input video path (with --batch: a directory or a manifest of paths)")
+    ap.add_argument("-o", "--output", type=Path, default=None,
+                    help="Output video path (default: video_81.<format>; a .npy path writes a frame "
+                         "array); with --batch, the output directory (default: video_81/)")
     ap.add_argument("--fps", type=float, default=None,
                     help="Output FPS (default: use input FPS or 25 if unknown)")
     ap.add_argument("--size", type=parse_size, default=None,
                     help="Optional output size WxH (e.g., 1920x1080). By default keep input size.")
+    ap.add_argument("--writer", choices=WRITER_BACKENDS, default="cv2",
+                    help="Encoder backend: cv2 (mp4v) or ffmpeg (libx264, browser-playable; default: cv2)")
+    ap.add_argument("--format", choices=OUTPUT_FORMATS, default="mp4",
+                    help="Default/batch output format: mp4 video or npy frame array for loaders "
+                         "(default: mp4)")
+    ap.add_argument("--sample", choices=SAMPLE_MODES, default="first",
+                    help="Which 81 frames: first (truncate/pad, default), uniform (evenly over the "
+                         "whole video) or fps (one every 1/--target-fps seconds)")
+    ap.add_argument("--target-fps", type=float, default=None,
+                    help="Sampling rate for --sample fps (also the default output FPS)")
+    ap.add_argument("--batch", action="store_true",
+                    help="Process every video in a directory (or listed in a manifest) with a process pool")
+    ap.add_argument("--workers", type=int, default=None,
+                    help="Batch worker processes (default: number of CPUs)")
+    ap.add_argument("--manifest", type=Path, default=None,
+                    help="Batch results JSONL; finished outputs listed here are skipped on restart "
+                         "(default: <output dir>/results.jsonl)")
+    ap.add_argument("--cache", type=Path, default=None,
+                    help="Artifact cache directory: reuse the result of an identical earlier request")
+    ap.add_argument("--cache-max", default=None,
+                    help="Cache size limit, LRU-evicted (e.g. 20G; default: $VIDEO_CACHE_MAX or 20G)")
+    profiling.add_argument(ap)
     args = ap.parse_args()
+    profiling.setup(args.profile)
+    if args.sample == "fps" and not args.target_fps:
+        ap.error("--sample fps needs --target-fps")
 
-    cap, in_fps, in_size = open_video(args.input)
-    out_fps = args.fps if (args.fps and args.fps > 0) else in_fps
+    if args.batch:
+        out_dir = args.output or Path("video_81")
+        root, inputs = collect_inputs(args.input)
+        jobs = [{"input": str(p), "output": str(output_path_for(p, root, out_dir, suffix="." + args.format)),
+                 "fps": args.fps, "size": args.size, "backend": args.writer,
+                 "cache": args.cache, "cache_max": args.cache_max,
+                 "sample": args.sample, "target_fps": args.target_fps} for p in inputs]
+        counts = run_batch(resize_81_file, jobs, args.manifest or out_dir / "results.jsonl",
+                           workers=args.workers, initializer=_worker_init)
+        if counts["error"]:
+            raise SystemExit(1)
+        return
 
-    frames = make_81_frames(cap, target=TARGET)
-    cap.release()
-
-    write_video(frames, args.output, out_fps, size=args.size)
-    print(f"Saved {len(frames)} frames to {args.output}  "
-          f"({(args.size or (in_size[0], in_size[1]))[0]}x{(args.size or (in_size[0], in_size[1]))[1]} @ {out_fps:.2f} fps)")
+    output = args.output or Path(f"video_81.{args.format}")
+    stats = resize_81_file(args.input, output, fps=args.fps, size=args.size, backend=args.writer,
+                           cache=args.cache, cache_max=args.cache_max,
+                           sample=args.sample, target_fps=args.target_fps)
+    if stats.get("cache") == "hit":
+        print(f"Saved {stats['frames']} frames to {output}  (from cache)")
+    else:
+        print(f"Saved {stats['frames']} frames to {output}  ({stats['size']} @ {stats['fps']:.2f} fps)")
 
 if __name__ == "__main__":
     main()
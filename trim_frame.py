@@ -1,17 +1,101 @@
+import argparse
 import os
 import subprocess
 
-def trim_by_frames(input_path, output_path="clip.mp4", start_frame=0, end_frame=80):
-    subprocess.run([
-        "ffmpeg", "-y",
+import cv2
+import numpy as np
+
+import profiling
+from video_index import video_info
+
+def _run(cmd):
+    with profiling.stage("ffmpeg"):
+        proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {proc.stderr.strip()}")
+
+def trim_by_frames(input_path, output_path="clip.mp4", start_frame=0, end_frame=80, fps=None):
+    """
+    Keep frames start_frame..end_frame (inclusive) without decoding the rest of the input.
+    - the frame range is mapped to a timestamp with the source fps (video index, or `fps`)
+    - input-side -ss makes ffmpeg seek to the nearest preceding keyframe and drop the
+      few decoded frames before the start, so the cut stays frame-accurate
+    - -frames:v stops decoding/encoding after the requested number of frames
+    - -fps_mode passthrough keeps the source timestamps (input -ss already starts them at 0);
+      without it ffmpeg may resample to 25 fps and drop or repeat frames
+    """
+    input_path, output_path = str(input_path), str(output_path)
+    if end_frame < start_frame:
+        raise ValueError("end_frame must be >= start_frame")
+    fps = fps or video_info(input_path)["fps"] or 25.0
+    count = end_frame - start_frame + 1
+    # Aim half a frame early so float rounding can never skip the start frame.
+    start_time = max(start_frame - 0.5, 0) / fps
+
+    cmd = ["ffmpeg", "-y", "-v", "error"]
+    if start_frame > 0:
+        cmd += ["-ss", f"{start_time:.6f}"]
+    cmd += [
         "-i", input_path,
-        "-vf", f"select='between(n\\,{start_frame}\\,{end_frame})',setpts=PTS-STARTPTS",
+        "-frames:v", str(count),
+        "-fps_mode", "passthrough",
         "-an",  # drop audio
         output_path
-    ])
+    ]
+    _run(cmd)
+    profiling.count_file("bytes_in", input_path)
+    profiling.count_file("bytes_out", output_path)
     print(f"✅ Saved frames {start_frame}–{end_frame} to {output_path}")
+    return output_path
 
+def _read_frames(path, start=0, end=None):
+    """Decode frames start..end (inclusive; end=None reads to the end)."""
+    cap = cv2.VideoCapture(str(path))
+    frames = []
+    n = 0
+    while end is None or n <= end:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if n >= start:
+            frames.append(frame)
+        n += 1
+    cap.release()
+    return frames
 
+def verify_trim(input_path, output_path, start_frame=0, end_frame=80, min_psnr=30.0):
+    """
+    Compare a trim_by_frames output with frames start_frame..end_frame decoded straight from
+    the source: same frame count, and every frame pair above `min_psnr` dB (one re-encode costs
+    a few dB; a frame off by one typically scores below 20 dB). Returns the lowest PSNR.
+    """
+    ref = _read_frames(input_path, start_frame, end_frame)
+    out = _read_frames(output_path)
+    if len(out) != len(ref):
+        raise RuntimeError(f"Frame count mismatch: {len(out)} vs {len(ref)} (source frames {start_frame}–{end_frame})")
+    worst = float("inf")
+    for a, b in zip(out, ref):
+        mse = np.mean((a.astype(np.float32) - b.astype(np.float32)) ** 2)
+        worst = min(worst, float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse))
+    if worst < min_psnr:
+        raise RuntimeError(f"Frame content mismatch: worst PSNR {worst:.1f} dB < {min_psnr} dB")
+    return worst
 
 if __name__ == "__main__":
-    trim_by_frames("/prj/corp/airesearch/lasvegas/vol5-scratch/users/phongnh/Long/prj-chronos/example_test_data/videos/true2.mp4", "clip.mp4", 0, 80)
\ No newline at end of file
+    ap = argparse.ArgumentParser(description="Cut a frame range out of a video (frame-accurate, keyframe seek).")
+    ap.add_argument("input", help="Input video path")
+    ap.add_argument("-o", "--output", default="clip.mp4", help="Output path (default: clip.mp4)")
+    ap.add_argument("--start", type=int, default=0, help="First frame to keep (default: 0)")
+    ap.add_argument("--end", type=int, default=80, help="Last frame to keep, inclusive (default: 80)")
+    ap.add_argument("--fps", type=float, default=None,
+                    help="Source FPS used to map frames to time (default: from the video index)")
+    ap.add_argument("--verify", action="store_true",
+                    help="Check the result against the same frames decoded from the source")
+    profiling.add_argument(ap)
+    args = ap.parse_args()
+    profiling.setup(args.profile)
+
+    trim_by_frames(args.input, args.output, args.start, args.end, fps=args.fps)
+    if args.verify:
+        worst = verify_trim(args.input, args.output, args.start, args.end)
+        print(f"Verified against the source frames (worst PSNR: {worst:.1f} dB)")
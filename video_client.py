@@ -0,0 +1,128 @@
+# video_client.py
+#
+# Thin client for video_worker.py: sends requests to the running worker over its Unix
+# socket and prints the replies. Imports only the standard library (and DEFAULT_SOCKET from
+# video_worker, which loads nothing heavy), so each call starts in a few milliseconds and
+# the real work runs in the worker's already-warm processes.
+#   python video_client.py ping
+#   python video_client.py last_frame clip.mp4 -o clip_last.jpg
+#   python video_client.py resize_81 clip.mp4 -o clip_81.mp4 --set size=832x480 --set sample=uniform
+#   python video_client.py trim clip.mp4 -o cut.mp4 --set start=10 --set end=50
+#   python video_client.py --jobs jobs.jsonl > results.jsonl   # many requests, one connection
+#
+# --set values are parsed as JSON when possible (numbers, true/false, null), else kept as text.
+# Ops: freeze, last_frame, resize_81, append_81, fix, trim (see OPS in video_worker.py).
+# Exits with status 1 if any request failed.
+
+import argparse
+import itertools
+import json
+import socket
+import sys
+import threading
+
+from video_worker import DEFAULT_SOCKET
+
+
+def _value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def parse_set(item):
+    key, sep, value = item.partition("=")
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {item!r}")
+    return key, _value(value)
+
+
+def request(requests, path=DEFAULT_SOCKET):
+    """
+    Send every request dict over one connection and yield the replies as they arrive
+    (completion order). Requests without an "id" are numbered from 0.
+    """
+    requests = [dict(r) for r in requests]
+    for i, r in enumerate(requests):
+        r.setdefault("id", i)
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(path)
+    except OSError as e:
+        s.close()
+        raise RuntimeError(f"No worker on {path} ({e}); start one with: python video_worker.py &")
+    def send():
+        # On its own thread, so replies are read while requests are still going out; with
+        # both sides writing and nobody reading, a large batch would fill the socket buffers.
+        try:
+            for r in requests:
+                s.sendall(json.dumps(r).encode() + b"\n")
+            s.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass  # the worker closed the connection; the reply loop ends too
+
+    with s, s.makefile("rb") as replies:
+        sender = threading.Thread(target=send, daemon=True)
+        sender.start()
+        for line in replies:
+            yield json.loads(line)
+        sender.join()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Send clip operations to a running video_worker.py.")
+    ap.add_argument("op", nargs="?", help="Operation (freeze, last_frame, resize_81, append_81, fix, trim, ping)")
+    ap.add_argument("input", nargs="?", help="Input video path")
+    ap.add_argument("-o", "--output", default=None, help="Output path")
+    ap.add_argument("--set", dest="opts", type=parse_set, action="append", default=[], metavar="KEY=VALUE",
+                    help="Option for the op, e.g. --set size=832x480 (repeatable)")
+    ap.add_argument("--jobs", default=None,
+                    help="JSONL file of requests ({\"op\", \"input\", \"output\", ...}), '-' for stdin; "
+                         "replies are printed as JSONL")
+    ap.add_argument("--profile", action="store_true", help="Include each job's profiling snapshot in the reply")
+    ap.add_argument("--socket", default=DEFAULT_SOCKET, help=f"Worker socket (default: {DEFAULT_SOCKET})")
+    args = ap.parse_args()
+
+    bad = []
+    if args.jobs:
+        f = sys.stdin if args.jobs == "-" else open(args.jobs)
+        reqs = []
+        with f:
+            for lineno, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    req = json.loads(line)
+                    if not isinstance(req, dict):
+                        raise ValueError("request must be a JSON object")
+                except ValueError as e:  # JSONDecodeError included
+                    bad.append({"id": None, "status": "error", "line": lineno, "error": f"bad request: {e}"})
+                    continue
+                reqs.append(req)
+    elif args.op == "ping":
+        reqs = [{"op": "ping"}]
+    elif args.op and args.input and args.output:
+        reqs = [{"op": args.op, "input": args.input, "output": args.output, **dict(args.opts)}]
+    else:
+        ap.error("give OP INPUT -o OUTPUT, 'ping', or --jobs FILE")
+    if args.profile:
+        for r in reqs:
+            r["profile"] = True
+
+    failed = 0
+    for reply in itertools.chain(bad, request(reqs, args.socket) if reqs else ()):
+        failed += reply.get("status") != "ok"
+        if args.jobs:
+            print(json.dumps(reply), flush=True)
+        elif reply.get("status") == "ok":
+            extra = {k: v for k, v in reply.items() if k not in ("id", "op", "status", "input", "output")}
+            print(f"{reply['op']}: {reply.get('output', '')} {json.dumps(extra)}".replace(" {}", ""))
+        else:
+            print(f"{reply.get('op')}: {reply['error']}", file=sys.stderr)
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+# video_index.py
+# pip install opencv-python   (ffprobe on PATH recommended)
+#
+# Per-video metadata + keyframe index, cached in a local SQLite file.
+# Stream headers (fps, size, codec, container frame count / duration) are read on first
+# touch; the exact frame count and keyframe list need a scan of the whole file (ffprobe
+# packet scan: no decoding; OpenCV grab() scan as a fallback), which only runs for callers
+# that ask for it (need_frames=True); callers that must stay cheap pass cheap_only=True to
+# skip the decoding fallback and get frame_count=None instead. Records are stored keyed by
+# (path, size, mtime), so later calls from any script, and repeat runs over a corpus, skip both.
+#   python video_index.py clips/ other.mp4        # warm the index and print records
+#
+# Cache location: $VIDEO_INDEX_DB, else ~/.cache/video_process/index.sqlite
+
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+from pathlib import Path
+
+import cv2
+
+from batch import collect_inputs
+
+DEFAULT_DB = Path.home() / ".cache" / "video_process" / "index.sqlite"
+
+
+def _fraction(s):
+    """ffprobe rational ("30000/1001") -> float, None for missing / 0/0."""
+    try:
+        num, _, den = str(s).partition("/")
+        val = float(num) / float(den or 1)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return val if val > 1e-3 else None
+
+
+def _float(s):
+    try:
+        return float(s)
+    except (TypeError, ValueError):
+        return None
+
+
+def _scan_ffprobe(path, need_frames=True):
+    """
+    Stream info via ffprobe, plus every video packet's pts/flags when need_frames (still
+    no decoding). None if ffprobe is unavailable.
+    """
+    entries = ("stream=codec_name,width,height,pix_fmt,time_base,r_frame_rate,avg_frame_rate,duration,nb_frames"
+               ":format=duration")
+    if need_frames:
+        entries += ":packet=pts_time,dts_time,flags"
+    try:
+        proc = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", entries,
+             "-of", "json", str(path)],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    except OSError:
+        return None
+    if proc.returncode != 0:
+        return None
+    data = json.loads(proc.stdout or "{}")
+    streams = data.get("streams") or []
+    if not streams:
+        return None
+    st = streams[0]
+    fps = _fraction(st.get("avg_frame_rate")) or _fraction(st.get("r_frame_rate"))
+    duration = _float(st.get("duration")) or _float((data.get("format") or {}).get("duration"))
+    info = {
+        "frame_count": None,
+        "nb_frames": int(_float(st.get("nb_frames")) or 0) or None,
+        "fps": fps,
+        "width": int(st.get("width") or 0),
+        "height": int(st.get("height") or 0),
+        "codec": st.get("codec_name"),
+        "pix_fmt": st.get("pix_fmt"),
+        "time_base": st.get("time_base"),
+        "r_frame_rate": st.get("r_frame_rate"),
+        "duration": duration,
+        "keyframes": None,
+        "keyframe_times": None,
+        "source": "ffprobe",
+    }
+    if not need_frames:
+        return info
+
+    # Packets come in decode order; frames are numbered in presentation order.
+    times, key_times = [], []
+    for pkt in data.get("packets") or []:
+        t = _float(pkt.get("pts_time"))
+        if t is None:
+            t = _float(pkt.get("dts_time"))
+        if t is None:
+            continue
+        times.append(t)
+        if "K" in pkt.get("flags", ""):
+            key_times.append(t)
+    times.sort()
+    key_times.sort()
+    order = {t: i for i, t in enumerate(times)}
+    if info["duration"] is None and len(times) > 1 and fps:
+        info["duration"] = times[-1] - times[0] + 1.0 / fps
+    info.update(frame_count=len(times), keyframes=[order[t] for t in key_times], keyframe_times=key_times)
+    return info
+
+
+def _scan_cv2(path, need_frames=True):
+    """
+    Fallback: container properties via OpenCV, plus a grab() frame count when need_frames
+    (demux + decode, but no colour conversion).
+    """
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video: {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    fps = fps if fps and fps > 1e-3 else None
+    w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+    codec = "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ") or None
+    nb_frames = max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0) or None
+    n = None
+    if need_frames:
+        n = 0
+        while cap.grab():
+            n += 1
+    cap.release()
+    count = n if n is not None else nb_frames
+    return {
+        "frame_count": n,
+        "nb_frames": nb_frames,
+        "fps": fps,
+        "width": w,
+        "height": h,
+        "codec": codec,
+        "pix_fmt": None,
+        "time_base": None,
+        "r_frame_rate": None,
+        "duration": count / fps if fps and count else None,
+        "keyframes": None,
+        "keyframe_times": None,
+        "source": "cv2",
+    }
+
+
+def scan_video(path, need_frames=True, cheap_only=False):
+    """Compute a fresh index record for one video (no cache); see video_info for the flags."""
+    return _scan_ffprobe(path, need_frames) or _scan_cv2(path, need_frames and not cheap_only)
+
+
+def _connect(db_path=None):
+    db_path = Path(db_path or os.environ.get("VIDEO_INDEX_DB") or DEFAULT_DB)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(str(db_path), timeout=60)
+    try:
+        con.execute("PRAGMA journal_mode=WAL")  # many concurrent readers, e.g. batch workers
+    except sqlite3.OperationalError:
+        pass  # e.g. network filesystems; default journal still works
+    con.execute("CREATE TABLE IF NOT EXISTS videos ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, info TEXT)")
+    return con
+
+
+def video_info(path, db_path=None, refresh=False, need_frames=False, cheap_only=False):
+    """
+    Cached index record for `path`:
+      frame_count, nb_frames, fps, width, height, codec, pix_fmt, time_base, r_frame_rate,
+      duration, keyframes (frame numbers), keyframe_times (seconds), source.
+    By default only the stream headers are read (cheap for any length): frame_count,
+    keyframes and keyframe_times are then None, and nb_frames / duration are whatever the
+    container claims. need_frames=True scans the packets (or grab()s every frame without
+    ffprobe) for the exact frame_count and the keyframes; the scan is cached too, so it
+    runs at most once per file. With cheap_only=True the grab() fallback is skipped: without
+    ffprobe, frame_count and keyframes stay None and the caller picks its own fallback.
+    fps / duration / nb_frames may be None and keyframes None (OpenCV fallback) when unknown.
+    The cache entry is reused while the file's size and mtime are unchanged.
+    """
+    path = Path(path).resolve()
+    st = path.stat()
+    con = _connect(db_path)
+    try:
+        if not refresh:
+            row = con.execute("SELECT size, mtime_ns, info FROM videos WHERE path = ?",
+                              (str(path),)).fetchone()
+            if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+                info = json.loads(row[2])
+                if (info["frame_count"] is not None or not need_frames
+                        or (cheap_only and info["source"] == "cv2")):
+                    return info
+        info = scan_video(path, need_frames, cheap_only)
+        with con:
+            con.execute("INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?)",
+                        (str(path), st.st_size, st.st_mtime_ns, json.dumps(info)))
+        return info
+    finally:
+        con.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build / show the cached per-video metadata and keyframe index.")
+    ap.add_argument("inputs", type=Path, nargs="+", help="Videos or directories of videos")
+    ap.add_argument("--db", type=Path, default=None, help=f"SQLite cache path (default: {DEFAULT_DB})")
+    ap.add_argument("--refresh", action="store_true", help="Rescan even if a cached record is valid")
+    args = ap.parse_args()
+
+    for src in args.inputs:
+        paths = collect_inputs(src)[1] if src.is_dir() else [src]
+        for p in paths:
+            try:
+                info = video_info(p, db_path=args.db, refresh=args.refresh, need_frames=True)
+            except (OSError, RuntimeError) as e:
+                print(json.dumps({"path": str(p), "error": str(e)}))
+                continue
+            kf = info["keyframes"]
+            print(json.dumps({"path": str(p), "frame_count": info["frame_count"], "fps": info["fps"],
+                              "size": f"{info['width']}x{info['height']}", "codec": info["codec"],
+                              "keyframes": len(kf) if kf is not None else None}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+# video_io.py
+# pip install opencv-python
+#
+# Shared frame reader / writer used by the scripts in this repo.
+# Decoding and encoding each run on their own background thread and talk to the
+# caller through bounded queues, so decode, per-frame processing (e.g. resize) and
+# encode overlap. OpenCV releases the GIL inside read/resize/write, so this uses
+# several cores without multiprocessing.
+
+import queue
+import subprocess
+import threading
+
+import cv2
+import numpy as np
+
+import profiling
+from clip_array import ClipArrayWriter
+
+QUEUE_SIZE = 32
+WRITER_BACKENDS = ("cv2", "ffmpeg")
+_END = object()
+
+
+class FrameReader:
+    """
+    Prefetching drop-in for cv2.VideoCapture.read().
+    - source: video path or an already opened cv2.VideoCapture
+    - queue_size: max number of decoded frames buffered ahead of the consumer
+    Use read() like a VideoCapture, or iterate over the reader directly.
+    """
+
+    def __init__(self, source, queue_size=QUEUE_SIZE):
+        if isinstance(source, cv2.VideoCapture):
+            self.cap = source
+        else:
+            self.cap = cv2.VideoCapture(str(source))
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Cannot open video: {source}")
+        if not isinstance(source, cv2.VideoCapture):
+            profiling.count_file("bytes_in", source)
+
+        # Grab metadata up front; the capture belongs to the decode thread from now on.
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        self._q = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._error = None
+        self._done = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                with profiling.stage("decode"):
+                    ok, frame = self.cap.read()
+                if not ok:
+                    break
+                profiling.count("frames_decoded")
+                if not self._put(frame):
+                    break
+        except Exception as e:  # surfaced to the consumer in read()
+            self._error = e
+        finally:
+            self._put(_END)
+
+    def read(self):
+        if self._done:
+            return False, None
+        item = self._q.get()
+        if item is _END:
+            self._done = True
+            if self._error is not None:
+                raise self._error
+            return False, None
+        return True, item
+
+    def __iter__(self):
+        while True:
+            ok, frame = self.read()
+            if not ok:
+                return
+            yield frame
+
+    def release(self):
+        self._stop.set()
+        # Unblock the decode thread if it is waiting on a full queue.
+        while self._thread.is_alive():
+            try:
+                self._q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self.cap.release()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AsyncWriter:
+    """
+    Wrap a writer (anything with write(frame) / release()) so that encoding runs on a
+    background thread. write() only blocks when `queue_size` frames are already pending.
+    `out_path` (optional) is only used to count the output size when profiling.
+    """
+
+    def __init__(self, writer, queue_size=QUEUE_SIZE, out_path=None):
+        self.writer = writer
+        self.out_path = out_path
+        self.frames_written = 0
+        self._q = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._q.get()
+            if item is _END:
+                return
+            if self._error is not None:
+                continue  # keep draining so write() never blocks forever
+            try:
+                with profiling.stage("encode"):
+                    self.writer.write(item)
+                self.frames_written += 1
+                profiling.count("frames_encoded")
+            except Exception as e:
+                self._error = e
+
+    def write(self, frame):
+        if self._error is not None:
+            raise self._error
+        self._q.put(frame)
+
+    def release(self):
+        self._q.put(_END)
+        self._thread.join()
+        with profiling.stage("encode"):
+            self.writer.release()  # flushes the encoder
+        if self.out_path is not None:
+            profiling.count_file("bytes_out", self.out_path)
+        if self._error is not None:
+            raise self._error
+
+    def isOpened(self):
+        return self.writer.isOpened()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class FFmpegWriter:
+    """
+    Pipe raw BGR frames into an ffmpeg subprocess (libx264, yuv420p, +faststart).
+    ffmpeg encodes with all cores and the result plays in browsers as-is, so no
+    extra viewable.py fix_mp4 pass is needed. `fps` may be a number or a fraction
+    string such as "30000/1001"; `output_args` are appended before the output path.
+    """
+
+    def __init__(self, out_path, fps, size, crf=18, preset="veryfast", output_args=()):
+        w, h = size
+        self.out_path = out_path
+        self.size = (int(w), int(h))
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24",
+            "-s", f"{self.size[0]}x{self.size[1]}", "-r", f"{fps}",
+            "-i", "-",
+            "-an",
+            # yuv420p needs even dimensions
+            "-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2",
+            "-c:v", "libx264", "-preset", preset, "-crf", str(crf),
+            "-pix_fmt", "yuv420p", "-threads", "0",
+            "-movflags", "+faststart",
+            *output_args,
+            str(out_path),
+        ]
+        try:
+            self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            raise RuntimeError("ffmpeg not found on PATH (needed for the ffmpeg writer).")
+        self._released = False
+
+    def write(self, frame):
+        if (frame.shape[1], frame.shape[0]) != self.size:
+            raise RuntimeError(f"Frame size {frame.shape[1]}x{frame.shape[0]} != writer size "
+                               f"{self.size[0]}x{self.size[1]}")
+        try:
+            self.proc.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            # ffmpeg died; release() reports its stderr
+            self.release()
+            raise RuntimeError(f"ffmpeg exited early while writing {self.out_path}")
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        err = self.proc.stderr.read().decode(errors="replace")
+        self.proc.stderr.close()
+        if self.proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed writing {self.out_path}: {err.strip()}")
+
+    def isOpened(self):
+        return self.proc.poll() is None
+
+
+def open_writer(out_path, fps, size, fourcc="mp4v", backend="cv2", queue_size=QUEUE_SIZE, meta=None):
+    """
+    Open a writer for `size` = (w, h) and wrap it in an AsyncWriter.
+    - backend "cv2": cv2.VideoWriter with `fourcc`
+    - backend "ffmpeg": FFmpegWriter (H.264, playable MP4); `fourcc` is ignored
+    An out_path ending in .npy always gets a ClipArrayWriter (memory-mappable frame array,
+    `meta` stored with it); backend and fourcc are ignored then.
+    """
+    if str(out_path).endswith(".npy"):
+        writer = ClipArrayWriter(out_path, fps, size, meta=meta)
+    elif backend == "ffmpeg":
+        writer = FFmpegWriter(out_path, fps, size)
+    elif backend == "cv2":
+        writer = cv2.VideoWriter(str(out_path), cv2.VideoWriter_fourcc(*fourcc), fps, tuple(size))
+        if not writer.isOpened():
+            raise RuntimeError(f"Cannot open output for writing: {out_path}")
+    else:
+        raise ValueError(f"Unknown writer backend: {backend} (choose from {WRITER_BACKENDS})")
+    return AsyncWriter(writer, queue_size=queue_size, out_path=out_path)
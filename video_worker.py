@@ -0,0 +1,295 @@
+# video_worker.py
+# pip install opencv-python
+#
+# Long-lived worker service: keeps a pool of processes with cv2 and the processing modules
+# already imported, so per-clip requests skip interpreter start-up, imports and argparse.
+# Requests and replies are JSON lines, over a Unix socket or over stdin/stdout:
+#   python video_worker.py --workers 4 &                     # serve on the default socket
+#   python video_client.py resize_81 clip.mp4 -o clip_81.mp4 --set size=832x480
+#   python video_worker.py --stdio < requests.jsonl          # or as a child process
+#
+# Request:  {"id": 1, "op": "resize_81", "input": "clip.mp4", "output": "clip_81.mp4", "size": "832x480"}
+# Reply:    {"id": 1, "op": "resize_81", "status": "ok", "input": ..., "output": ..., "seconds": 0.41, ...}
+#           {"id": 1, "op": "resize_81", "status": "error", "error": "RuntimeError: ...", ...}
+# Every op takes "input" and "output" plus the options listed in OPS; add "profile": true
+# to get that request's profiling snapshot in the reply. {"op": "ping"} answers at once.
+# Replies on one connection come back in completion order; match them by "id".
+#
+# This module imports nothing heavy at the top (the workers import the processing modules
+# in their initializer), so the client can share DEFAULT_SOCKET without loading cv2.
+
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from batch import _run_job, tmp_path_for
+
+DEFAULT_SOCKET = os.environ.get("VIDEO_WORKER_SOCKET") or str(
+    Path(tempfile.gettempdir()) / f"video_worker-{os.getuid()}.sock")
+
+
+def _parse_size(size):
+    if size is None or isinstance(size, (list, tuple)):
+        return tuple(size) if size else None
+    from resize_video_81 import parse_size
+    return parse_size(size)
+
+
+def _replace_from_tmp(output, produce):
+    """Run produce(tmp) and rename tmp to output (for functions that write in place)."""
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = tmp_path_for(output)
+    try:
+        produce(tmp)
+        os.replace(tmp, output)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def op_freeze(input, output, fps=None, backend="cv2"):
+    """freeze_first_frame_cv: first frame held for the clip length."""
+    from make_freeze_vid import freeze_first_frame_cv
+    _replace_from_tmp(output, lambda tmp: freeze_first_frame_cv(input, tmp, target_fps=fps, verbose=False,
+                                                                backend=backend))
+
+
+def op_last_frame(input, output, quality=95):
+    """read_last_frame, saved as JPG."""
+    from get_frame import save_last_frame_file
+    return save_last_frame_file(input, output, quality=quality)
+
+
+def op_resize_81(input, output, fps=None, size=None, backend="cv2", sample="first", target_fps=None):
+    """make_81_frames (or resampled with sample="uniform"/"fps") + optional resize."""
+    from resize_video_81 import resize_81_file
+    return resize_81_file(input, output, fps=fps, size=_parse_size(size), backend=backend, sample=sample,
+                          target_fps=target_fps)
+
+
+def op_append_81(input, output, truncate=False, backend="cv2"):
+    """Pad to 81 frames with the last frame (append_last_frame.py, streamed)."""
+    from append_last_frame import pad_81_file
+    return pad_81_file(input, output, truncate=truncate, backend=backend)
+
+
+def op_fix(input, output, force_transcode=False):
+    """fix_mp4: faststart remux, or H.264/AAC transcode when needed."""
+    from viewable import fix_mp4_file
+    return fix_mp4_file(input, output, force_transcode=force_transcode)
+
+
+def op_trim(input, output, start=0, end=80, fps=None):
+    """trim_by_frames: keep frames start..end (inclusive)."""
+    from trim_frame import trim_by_frames
+    _replace_from_tmp(output, lambda tmp: trim_by_frames(input, tmp, start_frame=start, end_frame=end, fps=fps))
+    return {"frames": end - start + 1}
+
+
+OPS = {
+    "freeze": op_freeze,
+    "last_frame": op_last_frame,
+    "resize_81": op_resize_81,
+    "append_81": op_append_81,
+    "fix": op_fix,
+    "trim": op_trim,
+}
+
+
+def _worker_init():
+    # Load everything once per worker process; that is what the daemon is for.
+    import cv2
+    import append_last_frame, get_frame, make_freeze_vid, resize_video_81, trim_frame, viewable  # noqa: F401
+    cv2.setNumThreads(1)
+    # The functions print progress; keep it (and ffmpeg's stdout) off the reply stream.
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+
+class WorkerPool:
+    """ProcessPoolExecutor that is rebuilt if a worker dies (e.g. a decoder segfault)."""
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def _new_pool(self):
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_worker_init)
+        for f in [pool.submit(os.getpid) for _ in range(self.workers)]:
+            f.result()  # start (and warm) every worker now, not on the first request
+        return pool
+
+    def submit(self, req, done):
+        """Run one request; done(reply) is called from a pool thread when it finishes."""
+        base = {"id": req.get("id"), "op": req.get("op")}
+        op = req.get("op")
+        if op == "ping":
+            done({**base, "status": "ok", "pid": os.getpid(), "workers": self.workers})
+            return
+        if op not in OPS:
+            done({**base, "status": "error", "error": f"unknown op {op!r} (choose from {sorted(OPS)})"})
+            return
+        job = {k: v for k, v in req.items() if k not in ("id", "op", "profile")}
+        if "input" not in job or "output" not in job:
+            done({**base, "status": "error", "error": "request needs 'input' and 'output'"})
+            return
+        with self._lock:
+            pool = self._pool
+            try:
+                fut = pool.submit(_run_job, OPS[op], job, bool(req.get("profile")))
+            except BrokenProcessPool:
+                pool = self._pool = self._new_pool()
+                fut = pool.submit(_run_job, OPS[op], job, bool(req.get("profile")))
+
+        def finished(f):
+            try:
+                rec = f.result()
+            except BrokenProcessPool as e:
+                self._restart(pool)
+                rec = {"input": job["input"], "output": job["output"], "status": "error",
+                       "error": f"worker crashed: {e}"}
+            done({**base, **rec})
+
+        fut.add_done_callback(finished)
+
+    def _restart(self, broken):
+        with self._lock:
+            if self._pool is broken:
+                print("[worker] a worker process died; restarting the pool", file=sys.stderr)
+                self._pool = self._new_pool()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+def serve_lines(pool, lines, write):
+    """
+    Read requests from the iterable `lines` and write(reply_line) each reply as it finishes.
+    Returns once every request has been answered.
+    """
+    pending = 0
+    cond = threading.Condition()
+    write_lock = threading.Lock()
+
+    def done(reply):
+        nonlocal pending
+        # Write outside `cond`: a client that is slow to read may block the write, and the
+        # reading loop below must still be able to take `cond` and accept more requests.
+        try:
+            with write_lock:
+                write(json.dumps(reply, default=str) + "\n")
+        finally:
+            with cond:
+                pending -= 1
+                cond.notify_all()
+
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode()
+        line = line.strip()
+        if not line:
+            continue
+        with cond:
+            pending += 1
+        try:
+            req = json.loads(line)
+            if not isinstance(req, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            done({"id": None, "status": "error", "error": f"bad request: {e}"})
+            continue
+        pool.submit(req, done)
+    with cond:
+        cond.wait_for(lambda: pending == 0)
+
+
+def _handler(pool):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            def write(s):
+                self.wfile.write(s.encode())
+                self.wfile.flush()
+            try:
+                serve_lines(pool, self.rfile, write)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client went away; its jobs still finish
+    return Handler
+
+
+def _claim_socket(path):
+    """Remove a stale socket file; refuse to start if another daemon answers on it."""
+    if not os.path.exists(path):
+        return
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(path)
+    except OSError:
+        os.unlink(path)
+        return
+    finally:
+        s.close()
+    raise RuntimeError(f"A worker is already listening on {path}")
+
+
+def serve_socket(pool, path=DEFAULT_SOCKET):
+    _claim_socket(path)
+    server = socketserver.ThreadingUnixStreamServer(path, _handler(pool))
+    server.daemon_threads = True
+    try:
+        print(f"[worker] listening on {path} with {pool.workers} workers", file=sys.stderr)
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def serve_stdio(pool):
+    out = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)  # stray prints in this process go to stderr, not into the replies
+    sys.stdout = sys.stderr
+    lock = threading.Lock()
+
+    def write(s):
+        with lock:
+            out.write(s)
+            out.flush()
+
+    serve_lines(pool, sys.stdin, write)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve clip operations from a warm worker pool (JSON lines).")
+    ap.add_argument("--socket", default=DEFAULT_SOCKET,
+                    help=f"Unix socket to listen on (default: $VIDEO_WORKER_SOCKET or {DEFAULT_SOCKET})")
+    ap.add_argument("--stdio", action="store_true",
+                    help="Read requests from stdin and write replies to stdout instead of a socket")
+    ap.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPUs)")
+    args = ap.parse_args()
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    pool = WorkerPool(args.workers)
+    try:
+        if args.stdio:
+            serve_stdio(pool)
+        else:
+            serve_socket(pool, args.socket)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
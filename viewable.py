@@ -5,12 +5,25 @@
 import subprocess
 import shlex
 import argparse
+import json
 import os
+import shutil
+import struct
 import sys
+from pathlib import Path
+
+from batch import collect_inputs, output_path_for, run_batch, tmp_path_for
+import profiling
+
+# What browsers play from an MP4 without help
+WEB_VIDEO_CODECS = {"h264"}
+WEB_PIX_FMTS = {"yuv420p", "yuvj420p"}
+WEB_AUDIO_CODECS = {"aac", "mp3"}
 
 def run(cmd):
     print(">>", cmd)
-    proc = subprocess.run(shlex.split(cmd), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    with profiling.stage("ffmpeg"):
+        proc = subprocess.run(shlex.split(cmd), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
     print(proc.stdout)
     return proc.returncode == 0
 
@@ -18,17 +31,133 @@ def ensure_ext(path, ext=".mp4"):
     root, e = os.path.splitext(path)
     return path if e.lower() == ext else root + ext
 
-def fix_mp4(input_mp4, output_mp4=None, force_transcode=False):
+def top_level_boxes(path, limit=64):
+    """Types of the first `limit` top-level MP4 boxes, read from their headers only."""
+    boxes = []
+    with open(path, "rb") as f:
+        total = os.fstat(f.fileno()).st_size
+        pos = 0
+        while pos + 8 <= total and len(boxes) < limit:
+            f.seek(pos)
+            size, typ = struct.unpack(">I4s", f.read(8))
+            if size == 1:  # 64-bit size follows
+                size = struct.unpack(">Q", f.read(8))[0]
+            elif size == 0:  # box runs to end of file
+                size = total - pos
+            if size < 8:
+                break
+            boxes.append(typ.decode("latin-1"))
+            pos += size
+    return boxes
+
+def probe_mp4(input_mp4):
+    """
+    Cheap look at the file before touching it: box order plus (if ffprobe is available)
+    codecs, pixel format, start time and the first packets' timestamps.
+    Returns a dict; "streams" is None when ffprobe is unavailable or fails.
+    """
+    boxes = top_level_boxes(input_mp4)
+    info = {
+        "moov_first": "moov" in boxes and ("mdat" not in boxes or boxes.index("moov") < boxes.index("mdat")),
+        "streams": None,
+    }
+    try:
+        proc = subprocess.run(
+            ["ffprobe", "-v", "error", "-read_intervals", "%+#30",
+             "-show_entries", "stream=codec_type,codec_name,pix_fmt:format=start_time:packet=pts_time",
+             "-of", "json", input_mp4],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        data = json.loads(proc.stdout or "{}") if proc.returncode == 0 else {}
+    except (OSError, ValueError):
+        data = {}
+    if data.get("streams"):
+        info["streams"] = data["streams"]
+        start = data.get("format", {}).get("start_time")
+        pts = [pk.get("pts_time") for pk in data.get("packets", [])]
+        info["timestamps_ok"] = (start not in (None, "N/A") and float(start) >= 0
+                                 and all(t not in (None, "N/A") for t in pts))
+    return info
+
+def plan_fix(input_mp4):
+    """
+    Decide up front what a file needs:
+      "skip"      already web-ready (moov first, H.264 yuv420p + AAC/MP3, sane timestamps)
+      "remux"     codecs are fine, only the container/timestamps need fixing
+      "transcode" codecs a browser can't play, so a remux would not help
+      "unknown"   no ffprobe: try remux, then transcode (original behaviour)
+    Returns (action, reason).
+    """
+    info = probe_mp4(input_mp4)
+    streams = info["streams"]
+    if streams is None:
+        return "unknown", "no stream info"
+    for st in streams:
+        if st.get("codec_type") == "video" and (st.get("codec_name") not in WEB_VIDEO_CODECS
+                                               or st.get("pix_fmt") not in WEB_PIX_FMTS):
+            return "transcode", f"video {st.get('codec_name')}/{st.get('pix_fmt')}"
+        if st.get("codec_type") == "audio" and st.get("codec_name") not in WEB_AUDIO_CODECS:
+            return "transcode", f"audio {st.get('codec_name')}"
+    if not any(st.get("codec_type") == "video" for st in streams):
+        return "transcode", "no video stream"
+    if not info["moov_first"]:
+        return "remux", "moov atom after mdat"
+    if not info["timestamps_ok"]:
+        return "remux", "missing or negative timestamps"
+    return "skip", "already web-ready"
+
+def fix_mp4(input_mp4, output_mp4=None, force_transcode=False, skip_ready=True, chunked=False, workers=None):
+    """
+    Probe first (plan_fix), then:
+    - skip files that are already web-ready (returns input_mp4, nothing is written)
+    - stream-copy (no re-encode) with moov-faststart and generated PTS when only the
+      container needs fixing
+    - re-encode to H.264/AAC directly when the codecs need it, if the remux fails,
+      or if force_transcode=True
+    - chunked: re-encode the video in parallel keyframe-aligned chunks (`workers`
+      processes, see chunked_encode.py) instead of one ffmpeg encoder
     """
-    Try stream-copy (no re-encode) with moov-faststart and generated PTS.
-    If that fails or force_transcode=True, re-encode to H.264/AAC.
+    return _fix_mp4(input_mp4, output_mp4, force_transcode, skip_ready, chunked, workers)[1]
+
+def _transcode_chunked(input_mp4, output_mp4, workers=None):
     """
+    Video encoded by chunked_encode.encode_chunked, then muxed with the input's audio
+    (re-encoded to AAC). Returns False if it did not work (caller falls back to ffmpeg).
+    """
+    from chunked_encode import encode_chunked  # needs OpenCV; only loaded for --chunked
+    video_tmp = os.path.splitext(output_mp4)[0] + ".video.tmp.mp4"
+    try:
+        try:
+            encode_chunked(input_mp4, video_tmp, workers=workers)
+        except (OSError, RuntimeError) as e:
+            print(f"[WARN] Chunked encode failed: {e}")
+            return False
+        return run(
+            f'ffmpeg -y -i "{video_tmp}" -i "{input_mp4}" '
+            f'-map 0:v:0 -map 1:a? -c:v copy -c:a aac -b:a 192k -movflags +faststart '
+            f'"{output_mp4}"'
+        )
+    finally:
+        if os.path.exists(video_tmp):
+            os.remove(video_tmp)
+
+def _fix_mp4(input_mp4, output_mp4=None, force_transcode=False, skip_ready=True, chunked=False, workers=None):
+    """fix_mp4 that also returns the action taken: (action, output path)."""
     if not os.path.exists(input_mp4):
         raise FileNotFoundError(input_mp4)
+    profiling.count_file("bytes_in", input_mp4)
     if output_mp4 is None:
         base, _ = os.path.splitext(input_mp4)
         output_mp4 = base + "_fixed.mp4"
     output_mp4 = ensure_ext(output_mp4)
+    os.makedirs(os.path.dirname(output_mp4) or ".", exist_ok=True)
+
+    action = "transcode"
+    if not force_transcode:
+        action, reason = plan_fix(input_mp4)
+        print(f"[plan] {action}: {reason}")
+        if action == "skip" and skip_ready:
+            print(f"[OK] Already web-ready, skipped: {input_mp4}")
+            return "skip", input_mp4
 
     # 1) Lossless remux (no quality change)
     # -fflags +genpts         : generate timestamps if missing
@@ -38,15 +167,21 @@ def fix_mp4(input_mp4, output_mp4=None, force_transcode=False):
     # -ignore_unknown         : skip unknown streams instead of failing
     remux_cmd = (
         f'ffmpeg -y -fflags +genpts -i "{input_mp4}" '
-        f'-map 0 -c copy -movflags +faststart -ignore_unknown 1 '
+        f'-map 0 -c copy -movflags +faststart -ignore_unknown '
         f'"{output_mp4}"'
     )
 
-    if not force_transcode and run(remux_cmd):
+    if action in ("skip", "remux", "unknown") and run(remux_cmd):
         print(f"[OK] Remuxed (no quality change): {output_mp4}")
-        return output_mp4
+        profiling.count_file("bytes_out", output_mp4)
+        return "remux", output_mp4
 
     # 2) Fallback: re-encode (very compatible H.264/AAC)
+    if chunked and _transcode_chunked(input_mp4, output_mp4, workers):
+        print(f"[OK] Transcoded in parallel chunks (H.264/AAC): {output_mp4}")
+        profiling.count_file("bytes_out", output_mp4)
+        return "transcode", output_mp4
+
     # -pix_fmt yuv420p        : widest compatibility
     # -vsync 2                : drop/dupe to fix timestamp issues
     # -movflags +faststart    : better web playback
@@ -60,20 +195,75 @@ def fix_mp4(input_mp4, output_mp4=None, force_transcode=False):
     )
     if run(trans_cmd):
         print(f"[OK] Transcoded (H.264/AAC): {output_mp4}")
-        return output_mp4
+        profiling.count_file("bytes_out", output_mp4)
+        return "transcode", output_mp4
 
     raise RuntimeError("Both remux and transcode paths failed.")
 
+def _place_copy(src, dst):
+    """Hard-link src at dst (copy across file systems), via temp name + rename."""
+    tmp = tmp_path_for(dst)
+    try:
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copy2(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def fix_mp4_file(input, output, force_transcode=False):
+    """
+    Batch job: fix one file and report the action taken (skip / remux / transcode).
+    A web-ready input that is skipped is linked (or copied) to `output`, so the output
+    directory is always complete and the manifest records the requested path.
+    """
+    action, out = _fix_mp4(input, output, force_transcode=force_transcode)
+    if action == "skip":
+        out = ensure_ext(str(output))
+        _place_copy(input, out)
+        profiling.count_file("bytes_out", out)
+        return {"action": action, "output": out, "source": str(input)}
+    return {"action": action, "output": out}
+
 if __name__ == "__main__":
     p = argparse.ArgumentParser(description="Repair/normalize an MP4 for better playback.")
-    p.add_argument("input", help="Path to input .mp4")
-    p.add_argument("-o", "--output", default=None, help="Output .mp4 path (default: *_fixed.mp4)")
+    p.add_argument("input", help="Path to input .mp4 (with --batch: a directory or manifest)")
+    p.add_argument("-o", "--output", default=None,
+                   help="Output .mp4 path (default: *_fixed.mp4); with --batch the output directory")
     p.add_argument("--force-transcode", action="store_true",
                    help="Skip remux and directly re-encode (H.264/AAC).")
+    p.add_argument("--chunked", action="store_true",
+                   help="Transcode the video in parallel keyframe-aligned chunks (long single files)")
+    p.add_argument("--batch", action="store_true",
+                   help="Normalize every video in a directory (or manifest) with a worker pool")
+    p.add_argument("--workers", type=int, default=None,
+                   help="Batch worker processes, or --chunked encoder processes (default: CPUs)")
+    p.add_argument("--manifest", default=None,
+                   help="Batch results JSONL (default: <output dir>/results.jsonl)")
+    profiling.add_argument(p)
     args = p.parse_args()
+    profiling.setup(args.profile)
+    if args.batch and args.chunked:
+        p.error("--chunked is for single files; --batch already runs one file per worker")
+
+    if args.batch:
+        out_dir = Path(args.output or "fixed")
+        root, inputs = collect_inputs(args.input)
+        jobs = [{"input": str(i), "output": str(output_path_for(i, root, out_dir)),
+                 "force_transcode": args.force_transcode} for i in inputs]
+        counts = run_batch(fix_mp4_file, jobs, args.manifest or out_dir / "results.jsonl",
+                           workers=args.workers, tally="action", verbose=False)
+        actions = counts["action"]
+        print(f"skipped (web-ready): {actions.get('skip', 0)}  remuxed: {actions.get('remux', 0)}  "
+              f"transcoded: {actions.get('transcode', 0)}  failed: {counts['error']}  "
+              f"already done: {counts['skipped']}")
+        sys.exit(1 if counts["error"] else 0)
 
     try:
-        out = fix_mp4(args.input, args.output, force_transcode=args.force_transcode)
+        out = fix_mp4(args.input, args.output, force_transcode=args.force_transcode,
+                      chunked=args.chunked, workers=args.workers)
         print("Saved:", out)
     except Exception as e:
         print("ERROR:", e)